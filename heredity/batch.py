@@ -0,0 +1,241 @@
+"""
+Batch heredity inference over many family files.
+
+Families are read from a directory of CSV files or from a manifest
+listing one CSV path per line, scored on a process pool, and written
+to stdout as JSON lines or CSV as soon as each family finishes.
+
+Exact inference only depends on who the parents of each person are,
+not on their names or traits, so families with the same shape share one
+compiled table of gene assignments and their prior probabilities.
+"""
+
+import argparse
+import csv
+import functools
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from heredity import (PROBS, empty_probabilities, inherit_probability,
+                      load_data, normalize)
+from sampling import gibbs_sampling, likelihood_weighting
+
+GENES = (0, 1, 2)
+
+# Number of same-shaped families scored by one worker task
+CHUNK_SIZE = 32
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Score many heredity family files."
+    )
+    parser.add_argument("source",
+                        help="directory of CSV files or manifest file")
+    parser.add_argument("--format", choices=["jsonl", "csv"],
+                        default="jsonl")
+    parser.add_argument("--method", choices=["exact", "gibbs", "likelihood"],
+                        default="exact")
+    parser.add_argument("--samples", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    writer = csv_writer(sys.stdout) if args.format == "csv" else json_writer(
+        sys.stdout
+    )
+    for filename, probabilities in run_batch(
+        family_files(args.source), args.method, args.samples, args.workers
+    ):
+        writer(filename, probabilities)
+        sys.stdout.flush()
+
+
+def family_files(source):
+    """
+    Return the family CSV files in directory `source`, or the files
+    listed one per line in manifest `source`. Relative paths in a
+    manifest are resolved against the manifest's directory.
+    """
+    if os.path.isdir(source):
+        return sorted(
+            os.path.join(source, filename)
+            for filename in os.listdir(source)
+            if filename.endswith(".csv")
+        )
+    base = os.path.dirname(source)
+    with open(source) as f:
+        return [
+            os.path.join(base, line.strip())
+            for line in f
+            if line.strip() and not line.startswith("#")
+        ]
+
+
+def pedigree_shape(people):
+    """
+    Return a hashable description of the family tree in `people`:
+    for each person in file order, the indices of their parents,
+    or None if their parents are unknown.
+    """
+    index = {name: i for i, name in enumerate(people)}
+    return tuple(
+        (index[person["mother"]], index[person["father"]])
+        if person["mother"] and person["father"] else None
+        for person in people.values()
+    )
+
+
+@functools.lru_cache(maxsize=256)
+def compile_pedigree(shape):
+    """
+    Return every gene assignment for a pedigree of shape `shape`
+    together with its prior probability, ignoring traits.
+    """
+    order = []
+    visited = set()
+
+    def visit(i):
+        if i in visited:
+            return
+        visited.add(i)
+        if shape[i] is not None:
+            visit(shape[i][0])
+            visit(shape[i][1])
+        order.append(i)
+
+    for i in range(len(shape)):
+        visit(i)
+
+    compiled = []
+    for genes in itertools.product(GENES, repeat=len(shape)):
+        prior = 1.0
+        for i in order:
+            if shape[i] is None:
+                prior *= PROBS["gene"][genes[i]]
+            else:
+                mom, dad = shape[i]
+                prior *= inherit_probability(genes[i], genes[mom], genes[dad])
+        compiled.append((genes, prior))
+    return compiled
+
+
+def exact_inference(people):
+    """
+    Return exact gene and trait probabilities for `people`,
+    reusing the compiled table for pedigrees of the same shape.
+    """
+    names = list(people)
+    compiled = compile_pedigree(pedigree_shape(people))
+    evidence = [
+        (i, people[name]["trait"]) for i, name in enumerate(names)
+        if people[name]["trait"] is not None
+    ]
+
+    gene = [[0.0, 0.0, 0.0] for _ in names]
+    for genes, prior in compiled:
+        p = prior
+        for i, trait in evidence:
+            p *= PROBS["trait"][genes[i]][trait]
+        for i, copies in enumerate(genes):
+            gene[i][copies] += p
+
+    probabilities = empty_probabilities(people)
+    for i, name in enumerate(names):
+        for copies in GENES:
+            probabilities[name]["gene"][copies] = gene[i][copies]
+    normalize(probabilities)
+
+    # A trait only depends on the person's own genes
+    for name in names:
+        trait = people[name]["trait"]
+        for value in (True, False):
+            if trait is not None:
+                p = float(trait == value)
+            else:
+                p = sum(probabilities[name]["gene"][g] *
+                        PROBS["trait"][g][value] for g in GENES)
+            probabilities[name]["trait"][value] = p
+    return probabilities
+
+
+def score_families(filenames, method, samples):
+    """
+    Score each family in `filenames`, returning a list of
+    `(filename, probabilities)` pairs.
+    """
+    results = []
+    for filename in filenames:
+        people = load_data(filename)
+        if method == "exact":
+            probabilities = exact_inference(people)
+        elif method == "gibbs":
+            probabilities, _ = gibbs_sampling(people, samples)
+        else:
+            probabilities, _ = likelihood_weighting(people, samples)
+        results.append((filename, probabilities))
+    return results
+
+
+def run_batch(filenames, method="exact", samples=1000, workers=None):
+    """
+    Score every family in `filenames` on a process pool, yielding
+    `(filename, probabilities)` pairs in the order they finish.
+    Families of the same shape are sent to the same task so that
+    each task compiles its pedigree at most once.
+    """
+    groups = {}
+    for filename in filenames:
+        shape = pedigree_shape(load_data(filename))
+        groups.setdefault(shape, []).append(filename)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(score_families, group[i:i + CHUNK_SIZE],
+                            method, samples)
+            for group in groups.values()
+            for i in range(0, len(group), CHUNK_SIZE)
+        ]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+def json_writer(stream):
+    """
+    Return a function that writes one JSON line per person.
+    """
+    def write(filename, probabilities):
+        for person, distributions in probabilities.items():
+            stream.write(json.dumps({
+                "file": filename,
+                "person": person,
+                "gene": {str(g): p for g, p in distributions["gene"].items()},
+                "trait": {str(t).lower(): p
+                          for t, p in distributions["trait"].items()}
+            }) + "\n")
+    return write
+
+
+def csv_writer(stream):
+    """
+    Return a function that writes one CSV row per person,
+    after a single header row.
+    """
+    writer = csv.writer(stream)
+    writer.writerow(["file", "person", "gene_2", "gene_1", "gene_0",
+                     "trait_true", "trait_false"])
+
+    def write(filename, probabilities):
+        for person, distributions in probabilities.items():
+            writer.writerow([
+                filename, person,
+                *(f"{distributions['gene'][g]:.6f}" for g in (2, 1, 0)),
+                *(f"{distributions['trait'][t]:.6f}" for t in (True, False))
+            ])
+    return write
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Compare linear-space and log-space exact inference for heredity.
+
+For each family file, times `infer` in both modes and reports the
+largest difference between the two sets of marginals. Then shows that
+the joint probability of a large generated pedigree underflows in
+linear space but stays finite in log space.
+"""
+
+import sys
+import time
+
+from heredity import (infer, joint_probability, load_data,
+                      log_joint_probability)
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python benchmark.py data.csv [data.csv ...]")
+
+    print(f"{'family':<24}{'linear (s)':>12}{'log (s)':>12}"
+          f"{'overhead':>10}{'max diff':>12}")
+    for filename in sys.argv[1:]:
+        people = load_data(filename)
+        linear, linear_time = timed(infer, people)
+        log, log_time = timed(infer, people, log_space=True)
+        print(f"{filename:<24}{linear_time:>12.4f}{log_time:>12.4f}"
+              f"{log_time / linear_time:>9.2f}x"
+              f"{max_difference(linear, log):>12.2e}")
+
+    people = chain_pedigree(200)
+    names = set(people)
+    p = joint_probability(people, set(), set(), names)
+    log_p = log_joint_probability(people, set(), set(), names)
+    print()
+    print(f"Joint probability of {len(people)} people "
+          "with the trait but no gene:")
+    print(f"  linear space: {p}")
+    print(f"  log space:    {log_p:.2f}")
+
+
+def timed(f, *args, **kwargs):
+    """
+    Return the result of calling `f` and the seconds it took.
+    """
+    start = time.perf_counter()
+    result = f(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def max_difference(a, b):
+    """
+    Return the largest absolute difference between two sets of marginals.
+    """
+    return max(
+        abs(a[person][field][value] - b[person][field][value])
+        for person in a
+        for field in a[person]
+        for value in a[person][field]
+    )
+
+
+def chain_pedigree(n):
+    """
+    Return `n` people in which each generation is the child of the
+    previous two, with no known traits.
+    """
+    people = {}
+    for i in range(n):
+        name = f"P{i}"
+        people[name] = {
+            "name": name,
+            "mother": f"P{i - 2}" if i >= 2 else None,
+            "father": f"P{i - 1}" if i >= 2 else None,
+            "trait": None
+        }
+    return people
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import csv
 import itertools
+import math
 import sys
 
 PROBS = {
@@ -41,25 +42,30 @@ people = {}
 def main():
     global people
     # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
+    if len(sys.argv) not in [2, 3] or sys.argv[2:] not in [[], ["--log"]]:
+        sys.exit("Usage: python heredity.py data.csv [--log]")
     people = load_data(sys.argv[1])
 
+    # Compute gene and trait probabilities for each person
+    probabilities = infer(people, log_space=len(sys.argv) == 3)
+
+    # Print results
+    print_probabilities(people, probabilities)
+
+
+def infer(people, log_space=False):
+    """
+    Return normalized gene and trait probabilities for each person,
+    summing the joint probability of every consistent assignment.
+
+    If `log_space` is True, joint probabilities are accumulated as
+    logarithms so that large families do not underflow to 0.
+    """
+
     # Keep track of gene and trait probabilities for each person
-    probabilities = {
-        person: {
-            "gene": {
-                2: 0,
-                1: 0,
-                0: 0
-            },
-            "trait": {
-                True: 0,
-                False: 0
-            }
-        }
-        for person in people
-    }
+    probabilities = empty_probabilities(
+        people, -math.inf if log_space else 0
+    )
 
     # Loop over all sets of people who might have the trait
     names = set(people)
@@ -79,13 +85,52 @@ def main():
             for two_genes in powerset(names - one_gene):
 
                 # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+                if log_space:
+                    p = log_joint_probability(
+                        people, one_gene, two_genes, have_trait
+                    )
+                    log_update(probabilities, one_gene, two_genes,
+                               have_trait, p)
+                else:
+                    p = joint_probability(
+                        people, one_gene, two_genes, have_trait
+                    )
+                    update(probabilities, one_gene, two_genes,
+                           have_trait, p)
 
     # Ensure probabilities sum to 1
-    normalize(probabilities)
+    if log_space:
+        log_normalize(probabilities)
+    else:
+        normalize(probabilities)
+    return probabilities
 
-    # Print results
+
+def empty_probabilities(people, value=0):
+    """
+    Return a gene and trait distribution for each person,
+    with every probability set to `value`.
+    """
+    return {
+        person: {
+            "gene": {
+                2: value,
+                1: value,
+                0: value
+            },
+            "trait": {
+                True: value,
+                False: value
+            }
+        }
+        for person in people
+    }
+
+
+def print_probabilities(people, probabilities):
+    """
+    Print the gene and trait distributions for each person.
+    """
     for person in people:
         print(f"{person}:")
         for field in probabilities[person]:
@@ -137,6 +182,33 @@ def count_genes(name, one_gene, two_genes):
         copies = 2
     return copies
 
+def pass_probability(parent_copies):
+    """
+    Return the probability that a parent with `parent_copies` copies
+    of the gene passes one copy on to a child.
+    """
+    mutation = PROBS["mutation"]
+    if parent_copies == 2:
+        return 1 - mutation
+    if parent_copies == 1:
+        return .5
+    return mutation
+
+
+def inherit_probability(copies, mom_copies, dad_copies):
+    """
+    Return the probability that a child has `copies` copies of the gene,
+    given how many copies the mother and father have.
+    """
+    from_mom = pass_probability(mom_copies)
+    from_dad = pass_probability(dad_copies)
+    if copies == 2:
+        return from_mom * from_dad
+    elif copies == 1:
+        return from_mom * (1-from_dad) + (1-from_mom) * from_dad
+    return (1-from_mom) * (1-from_dad)
+
+
 def joint_probability(people, one_gene, two_genes, have_trait):
     """
     Compute and return a joint probability.
@@ -156,20 +228,9 @@ def joint_probability(people, one_gene, two_genes, have_trait):
         # print("person:", person)
         if person["mother"] and person["father"]:
             # Conditional probability based on parents
-            mom = person["mother"]
-            dad = person["father"]
-            mom_copies = count_genes(mom, one_gene, two_genes)
-            dad_copies = count_genes(dad, one_gene, two_genes)
-            mutation = PROBS["mutation"]
-            notmut = 1 - mutation
-            from_mom = notmut if mom_copies == 2 else .5 if mom_copies == 1 else mutation
-            from_dad = notmut if dad_copies == 2 else .5 if dad_copies == 1 else mutation
-            if copies == 2:
-                pcopies = from_mom * from_dad
-            elif copies == 1:
-                pcopies = from_mom * (1-from_dad) + (1-from_mom) * from_dad
-            else:
-                pcopies = (1-from_mom) * (1-from_dad)                
+            mom_copies = count_genes(person["mother"], one_gene, two_genes)
+            dad_copies = count_genes(person["father"], one_gene, two_genes)
+            pcopies = inherit_probability(copies, mom_copies, dad_copies)
         else:
             # Unconditional probability based on prior for known copies
             pcopies = PROBS["gene"][copies]
@@ -180,6 +241,43 @@ def joint_probability(people, one_gene, two_genes, have_trait):
         
     return rc
 
+def log_joint_probability(people, one_gene, two_genes, have_trait):
+    """
+    Compute and return the natural logarithm of the joint probability
+    computed by `joint_probability`, as a sum of log factors.
+    Returns -inf if the assignment is impossible.
+    """
+    rc = 0.0
+    for name in people:
+        person = people[name]
+        copies = count_genes(name, one_gene, two_genes)
+        trait = name in have_trait
+        if person["mother"] and person["father"]:
+            mom_copies = count_genes(person["mother"], one_gene, two_genes)
+            dad_copies = count_genes(person["father"], one_gene, two_genes)
+            pcopies = inherit_probability(copies, mom_copies, dad_copies)
+        else:
+            pcopies = PROBS["gene"][copies]
+
+        p = pcopies * PROBS["trait"][copies][trait]
+        if not p:
+            return -math.inf
+        rc += math.log(p)
+
+    return rc
+
+def log_add(a, b):
+    """
+    Return log(exp(a) + exp(b)) without leaving log space.
+    """
+    if a == -math.inf:
+        return b
+    if b == -math.inf:
+        return a
+    if a < b:
+        a, b = b, a
+    return a + math.log1p(math.exp(b - a))
+
 def update(probabilities, one_gene, two_genes, have_trait, p):
     """
     Add to `probabilities` a new joint probability `p`.
@@ -200,6 +298,45 @@ def update(probabilities, one_gene, two_genes, have_trait, p):
         else:
             probabilities[person]["trait"][False] += p
 
+def log_update(probabilities, one_gene, two_genes, have_trait, log_p):
+    """
+    Add to log-space `probabilities` a new joint log probability `log_p`,
+    using log-sum-exp accumulation in place of `update`'s addition.
+    """
+    for person in probabilities:
+        if person in one_gene:
+            copies = 1
+        elif person in two_genes:
+            copies = 2
+        else:
+            copies = 0
+        gene = probabilities[person]["gene"]
+        gene[copies] = log_add(gene[copies], log_p)
+
+        trait = probabilities[person]["trait"]
+        has_trait = person in have_trait
+        trait[has_trait] = log_add(trait[has_trait], log_p)
+
+def log_normalize(probabilities):
+    """
+    Replace each log-space distribution in `probabilities` with the
+    normalized linear-space distribution it represents. Distributions
+    with no possible value are left as all zeros.
+    """
+    for person in probabilities:
+        for field in probabilities[person]:
+            distribution = probabilities[person][field]
+            largest = max(distribution.values())
+            if largest == -math.inf:
+                for value in distribution:
+                    distribution[value] = 0
+                continue
+            total = sum(math.exp(v - largest) for v in distribution.values())
+            for value in distribution:
+                distribution[value] = (
+                    math.exp(distribution[value] - largest) / total
+                )
+
 def normalize(probabilities):
     """
     Update `probabilities` such that each probability distribution
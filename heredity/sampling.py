@@ -0,0 +1,340 @@
+"""
+Approximate heredity inference by sampling.
+
+Exact inference in heredity.py enumerates every combination of gene
+counts, which is hopeless for pedigrees with hundreds of people.
+This module estimates the same marginals with likelihood weighting or
+Gibbs sampling. Both run several independent chains in lock-step and
+report standard errors computed from the spread between chains.
+"""
+
+import math
+import random
+import sys
+
+from heredity import (PROBS, empty_probabilities, inherit_probability,
+                      load_data, print_probabilities)
+
+GENES = (0, 1, 2)
+
+
+def main():
+
+    # Check for proper usage
+    if len(sys.argv) not in [2, 3, 4]:
+        sys.exit("Usage: python sampling.py data.csv "
+                 "[likelihood|gibbs] [samples]")
+    people = load_data(sys.argv[1])
+    method = sys.argv[2] if len(sys.argv) > 2 else "gibbs"
+    samples = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+
+    if method == "likelihood":
+        probabilities, diagnostics = likelihood_weighting(people, samples)
+    elif method == "gibbs":
+        probabilities, diagnostics = gibbs_sampling(people, samples)
+    else:
+        sys.exit(f"Unknown method {method}")
+
+    print_probabilities(people, probabilities)
+    print(f"Max standard error: {max_value(diagnostics['stderr']):.4f}")
+    if "rhat" in diagnostics:
+        print(f"Max R-hat: {max_value(diagnostics['rhat']):.4f}")
+    if "ess" in diagnostics:
+        print(f"Effective sample size: {diagnostics['ess']:.1f}")
+
+
+def topological_order(people):
+    """
+    Return a list of names in which every parent comes before
+    their children.
+    """
+    order = []
+    visited = set()
+
+    def visit(name):
+        if name in visited:
+            return
+        visited.add(name)
+        for parent in (people[name]["mother"], people[name]["father"]):
+            if parent:
+                visit(parent)
+        order.append(name)
+
+    for name in people:
+        visit(name)
+    return order
+
+
+def children_of(people):
+    """
+    Return a dictionary mapping each name to the list of their children.
+    """
+    children = {name: [] for name in people}
+    for name, person in people.items():
+        if person["mother"] and person["father"]:
+            children[person["mother"]].append(name)
+            children[person["father"]].append(name)
+    return children
+
+
+def gene_distribution(person, genes, chain):
+    """
+    Return the distribution over gene counts for `person` given
+    the gene counts of their parents in `chain`.
+    """
+    if person["mother"] and person["father"]:
+        mom_copies = genes[person["mother"]][chain]
+        dad_copies = genes[person["father"]][chain]
+        return [inherit_probability(g, mom_copies, dad_copies)
+                for g in GENES]
+    return [PROBS["gene"][g] for g in GENES]
+
+
+def trait_distribution(person, copies):
+    """
+    Return the probability that `person` has and does not have the trait,
+    given their gene count. Known traits are returned as certainties.
+    """
+    if person["trait"] is not None:
+        return {True: float(person["trait"]), False: float(not person["trait"])}
+    return {trait: PROBS["trait"][copies][trait] for trait in (True, False)}
+
+
+def sample(rng, distribution):
+    """
+    Return a gene count drawn from an unnormalized `distribution`.
+    """
+    r = rng.random() * sum(distribution)
+    for g in GENES:
+        r -= distribution[g]
+        if r < 0:
+            return g
+    return GENES[-1]
+
+
+def forward_sample(people, order, chains, rng):
+    """
+    Return gene counts for every person in every chain,
+    sampled from the prior in topological order.
+    """
+    genes = {name: [0] * chains for name in people}
+    for name in order:
+        for c in range(chains):
+            distribution = gene_distribution(people[name], genes, c)
+            genes[name][c] = sample(rng, distribution)
+    return genes
+
+
+def likelihood_weighting(people, samples=10000, chains=4, seed=None):
+    """
+    Estimate gene and trait marginals by likelihood weighting.
+
+    Gene counts are sampled from the prior in topological order and
+    each sample is weighted by the likelihood of the known traits.
+    Weights are kept in log space and rescaled as they accumulate,
+    so large pedigrees do not underflow.
+
+    Returns `(probabilities, diagnostics)`, where `probabilities` has
+    the same structure that `heredity.main` prints and `diagnostics`
+    holds the standard error of every probability and the effective
+    sample size summed over chains.
+    """
+    rng = random.Random(seed)
+    order = topological_order(people)
+    sums = [empty_probabilities(people) for _ in range(chains)]
+    scale = [-math.inf] * chains
+    total = [0.0] * chains
+    total_squared = [0.0] * chains
+
+    for _ in range(samples):
+        genes = forward_sample(people, order, chains, rng)
+
+        for c in range(chains):
+
+            # Weight the sample by the likelihood of the evidence
+            log_weight = 0.0
+            for name, person in people.items():
+                if person["trait"] is not None:
+                    p = PROBS["trait"][genes[name][c]][person["trait"]]
+                    log_weight += math.log(p) if p else -math.inf
+            if log_weight == -math.inf:
+                continue
+
+            # Rescale earlier sums when a larger weight arrives
+            if log_weight > scale[c]:
+                factor = math.exp(scale[c] - log_weight)
+                rescale(sums[c], factor)
+                total[c] *= factor
+                total_squared[c] *= factor * factor
+                scale[c] = log_weight
+            w = math.exp(log_weight - scale[c])
+            total[c] += w
+            total_squared[c] += w * w
+
+            for name, person in people.items():
+                copies = genes[name][c]
+                sums[c][name]["gene"][copies] += w
+                for trait, p in trait_distribution(person, copies).items():
+                    sums[c][name]["trait"][trait] += w * p
+
+    for c in range(chains):
+        if total[c]:
+            rescale(sums[c], 1 / total[c])
+    ess = sum(total[c] ** 2 / total_squared[c]
+              for c in range(chains) if total_squared[c])
+
+    probabilities, stderr = combine_chains(people, sums)
+    return probabilities, {"stderr": stderr, "ess": ess}
+
+
+def gibbs_sampling(people, samples=1000, chains=4, burn_in=100, seed=None):
+    """
+    Estimate gene and trait marginals by Gibbs sampling.
+
+    Each sweep resamples every person's gene count from its
+    distribution conditioned on their parents, their own trait
+    and their children. Marginals are averaged from those
+    conditional distributions rather than from the sampled counts,
+    which gives lower variance for the same number of sweeps.
+
+    Returns `(probabilities, diagnostics)`, where `probabilities` has
+    the same structure that `heredity.main` prints and `diagnostics`
+    holds the standard error and Gelman-Rubin R-hat of every probability.
+    """
+    rng = random.Random(seed)
+    order = topological_order(people)
+    children = children_of(people)
+    genes = forward_sample(people, order, chains, rng)
+    sums = [empty_probabilities(people) for _ in range(chains)]
+    squares = [empty_probabilities(people) for _ in range(chains)]
+
+    for sweep in range(burn_in + samples):
+        for name in order:
+            person = people[name]
+            for c in range(chains):
+
+                # Distribution over this person's genes given everyone else
+                distribution = gene_distribution(person, genes, c)
+                for g in GENES:
+                    if person["trait"] is not None:
+                        distribution[g] *= PROBS["trait"][g][person["trait"]]
+                    for child in children[name]:
+                        mom = people[child]["mother"]
+                        dad = people[child]["father"]
+                        distribution[g] *= inherit_probability(
+                            genes[child][c],
+                            g if mom == name else genes[mom][c],
+                            g if dad == name else genes[dad][c]
+                        )
+                genes[name][c] = sample(rng, distribution)
+
+                if sweep < burn_in:
+                    continue
+                accumulate(sums[c][name], squares[c][name],
+                           person, distribution)
+
+    for c in range(chains):
+        rescale(sums[c], 1 / samples)
+        rescale(squares[c], 1 / samples)
+
+    probabilities, stderr = combine_chains(people, sums)
+    rhat = gelman_rubin(people, sums, squares, samples)
+    return probabilities, {"stderr": stderr, "rhat": rhat}
+
+
+def accumulate(sums, squares, person, distribution):
+    """
+    Add the normalized gene `distribution` of one person, and the
+    trait distribution it implies, to their running sums and squares.
+    """
+    total = sum(distribution)
+    if not total:
+        return
+    trait = {True: 0, False: 0}
+    for g in GENES:
+        p = distribution[g] / total
+        sums["gene"][g] += p
+        squares["gene"][g] += p * p
+        for value, q in trait_distribution(person, g).items():
+            trait[value] += p * q
+    for value, p in trait.items():
+        sums["trait"][value] += p
+        squares["trait"][value] += p * p
+
+
+def rescale(probabilities, factor):
+    """
+    Multiply every probability in `probabilities` by `factor`.
+    """
+    for person in probabilities:
+        for field in probabilities[person]:
+            for value in probabilities[person][field]:
+                probabilities[person][field][value] *= factor
+
+
+def combine_chains(people, estimates):
+    """
+    Average per-chain `estimates` into a single set of probabilities,
+    and return it together with the standard error of each probability.
+    """
+    chains = len(estimates)
+    probabilities = empty_probabilities(people)
+    stderr = empty_probabilities(people)
+    for person in probabilities:
+        for field in probabilities[person]:
+            for value in probabilities[person][field]:
+                values = [estimate[person][field][value]
+                          for estimate in estimates]
+                mean = sum(values) / chains
+                probabilities[person][field][value] = mean
+                if chains > 1:
+                    variance = sum((v - mean) ** 2 for v in values)
+                    stderr[person][field][value] = math.sqrt(
+                        variance / (chains - 1) / chains
+                    )
+    return probabilities, stderr
+
+
+def gelman_rubin(people, means, squares, samples):
+    """
+    Return the Gelman-Rubin potential scale reduction factor of each
+    probability, given per-chain means and mean squares over `samples`.
+    Values close to 1 indicate that the chains have converged.
+    """
+    chains = len(means)
+    rhat = empty_probabilities(people)
+    for person in rhat:
+        for field in rhat[person]:
+            for value in rhat[person][field]:
+                m = [mean[person][field][value] for mean in means]
+                s = [square[person][field][value] for square in squares]
+                grand = sum(m) / chains
+                between = (samples * sum((x - grand) ** 2 for x in m)
+                           / max(chains - 1, 1))
+                within = sum(
+                    (s[c] - m[c] ** 2) * samples / max(samples - 1, 1)
+                    for c in range(chains)
+                ) / chains
+                if within <= 0:
+                    rhat[person][field][value] = 1.0
+                    continue
+                pooled = (samples - 1) / samples * within + between / samples
+                rhat[person][field][value] = math.sqrt(pooled / within)
+    return rhat
+
+
+def max_value(probabilities):
+    """
+    Return the largest value in a set of per-person distributions.
+    """
+    return max(
+        (probabilities[person][field][value]
+         for person in probabilities
+         for field in probabilities[person]
+         for value in probabilities[person][field]),
+        default=0
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark every entailment engine in logic.ENGINES on generated
+knights and knaves puzzles, and check that they all agree.
+
+Usage: python benchmark.py [characters ...]
+"""
+
+import sys
+import time
+
+from generate import generate
+from logic import *
+
+# Largest number of characters each engine is timed on;
+# engines not listed here are timed on every size
+LIMITS = {
+    "enumerate": 8,
+    "parallel": 8,
+    "compiled": 12,
+    "prune": 20,
+}
+
+SIZES = [4, 6, 8, 10, 12, 15, 20, 30]
+
+PUZZLES = 3
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    engines = list(ENGINES)
+
+    print(f"{'characters':>10}" + "".join(f"{e:>12}" for e in engines))
+    for n in sizes:
+        totals = {engine: 0.0 for engine in engines}
+        for seed in range(PUZZLES):
+            knowledge, symbols, _, solution = generate(n, seed=seed)
+            answers = dict()
+            for engine in engines:
+                if n > LIMITS.get(engine, n):
+                    continue
+                start = time.perf_counter()
+                answers[engine] = model_check_all(knowledge, symbols, engine)
+                totals[engine] += time.perf_counter() - start
+            check(n, seed, symbols, solution, answers)
+
+        print(f"{n:>10}" + "".join(
+            f"{totals[e] / PUZZLES:>12.4f}" if n <= LIMITS.get(e, n)
+            else f"{'-':>12}"
+            for e in engines
+        ))
+
+
+def check(n, seed, symbols, solution, answers):
+    """
+    Exits with an error if engines disagree, or if any engine claims
+    a symbol is entailed when it is false in the hidden solution.
+    """
+    reference = next(iter(answers.values()))
+    for engine, answer in answers.items():
+        if answer != reference:
+            sys.exit(f"{engine} disagrees on {n} characters, seed {seed}")
+        for symbol, entailed in zip(symbols, answer):
+            if entailed and not solution[symbol]:
+                sys.exit(f"{engine} entails false {symbol} "
+                         f"on {n} characters, seed {seed}")
+
+
+if __name__ == "__main__":
+    main()
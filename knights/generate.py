@@ -0,0 +1,119 @@
+"""
+Random knights and knaves puzzles.
+
+Each character is either a knight, who always tells the truth, or a
+knave, who always lies. A hidden assignment of roles is chosen first,
+and every character then makes a random nested statement about the
+others that is true if they are a knight and false if they are a knave,
+so the puzzle is always consistent with that assignment.
+"""
+
+import random
+import string
+import sys
+
+from logic import *
+
+
+def main():
+    if len(sys.argv) not in [2, 3]:
+        sys.exit("Usage: python generate.py characters [seed]")
+    n = int(sys.argv[1])
+    seed = int(sys.argv[2]) if len(sys.argv) == 3 else None
+
+    knowledge, symbols, statements, solution = generate(n, seed=seed)
+    for name, statement in statements.items():
+        print(f"{name} says \"{statement.formula()}\"")
+    print("Solution:")
+    for symbol in symbols:
+        if solution[symbol]:
+            print(f"    {symbol}")
+
+
+def character_names(n):
+    """Returns `n` distinct character names: A, B, ..., Z, A1, B1, ..."""
+    letters = string.ascii_uppercase
+    return [
+        letters[i % 26] + (str(i // 26) if i >= 26 else "")
+        for i in range(n)
+    ]
+
+
+def generate(n, depth=2, seed=None, unique=False, attempts=100):
+    """
+    Generates a puzzle with `n` speaking characters whose statements
+    nest up to `depth` connectives.
+
+    Returns `(knowledge, symbols, statements, solution)` where
+    `knowledge` is the puzzle's knowledge base, `symbols` lists every
+    "is a Knight" and "is a Knave" symbol, `statements` maps each name
+    to what they said, and `solution` maps each symbol to its value in
+    the hidden assignment.
+
+    If `unique` is True, puzzles are regenerated, up to `attempts`
+    times, until the knowledge base determines every character's role.
+    """
+    rng = random.Random(seed)
+    names = character_names(n)
+    knights = [Symbol(f"{name} is a Knight") for name in names]
+    knaves = [Symbol(f"{name} is a Knave") for name in names]
+    symbols = knights + knaves
+
+    rules = []
+    for knight, knave in zip(knights, knaves):
+        rules.append(Or(knight, knave))
+        rules.append(Not(And(knight, knave)))
+
+    for _ in range(attempts):
+        roles = [rng.random() < 0.5 for _ in names]
+        solution = dict()
+        for knight, knave, role in zip(knights, knaves, roles):
+            solution[knight] = role
+            solution[knave] = not role
+        model = {symbol.name: value for symbol, value in solution.items()}
+
+        statements = dict()
+        conjuncts = list(rules)
+        for i, name in enumerate(names):
+
+            # Draw statements until one matches the speaker's role
+            while True:
+                statement = random_statement(rng, knights, knaves, depth)
+                if statement.evaluate(model) == roles[i]:
+                    break
+            statements[name] = statement
+            conjuncts.append(Implication(knights[i], statement))
+            conjuncts.append(Implication(knaves[i], Not(statement)))
+
+        knowledge = And(*conjuncts)
+        if not unique or all(model_check_all(knowledge, [
+            symbol if solution[symbol] else Not(symbol) for symbol in knights
+        ])):
+            return knowledge, symbols, statements, solution
+
+    raise Exception(f"no unique puzzle found in {attempts} attempts")
+
+
+def random_statement(rng, knights, knaves, depth):
+    """
+    Returns a random claim about the characters' roles, built from
+    "X is a knight" and "X is a knave" with And, Or, Not and
+    Biconditional ("X and Y are the same kind") up to `depth` deep.
+    """
+    if depth == 0 or rng.random() < 0.3:
+        i = rng.randrange(len(knights))
+        return knights[i] if rng.random() < 0.5 else knaves[i]
+    kinds = ["and", "or", "not"] + (["same"] if len(knights) > 1 else [])
+    kind = rng.choice(kinds)
+    if kind == "not":
+        return Not(random_statement(rng, knights, knaves, depth - 1))
+    if kind == "same":
+        i, j = rng.sample(range(len(knights)), 2)
+        return Biconditional(knights[i], knights[j])
+    left = random_statement(rng, knights, knaves, depth - 1)
+    right = random_statement(rng, knights, knaves, depth - 1)
+    return And(left, right) if kind == "and" else Or(left, right)
+
+
+if __name__ == "__main__":
+    main()
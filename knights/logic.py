@@ -1,19 +1,85 @@
+import functools
 import itertools
+import math
+import multiprocessing
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from sat import Solver
 
 
 class Sentence():
+    """
+    Sentences are immutable and hash-consed: constructing a sentence
+    equal to one that already exists returns the existing object,
+    so equal sentences are identical and share their subtrees.
+    Hashes are computed once, and symbol sets once on first use.
+    """
+
+    __slots__ = ("_hash", "_symbols", "__weakref__")
+
+    # Every live sentence, keyed by its class name and operands
+    interned = weakref.WeakValueDictionary()
 
     def evaluate(self, model):
         """Evaluates the logical sentence."""
         raise Exception("nothing to evaluate")
 
+    def partial_evaluate(self, model):
+        """
+        Evaluates the logical sentence in a model that may leave some
+        symbols unassigned. Returns True or False if every completion
+        of the model gives that value, and None otherwise.
+        """
+        raise Exception("nothing to evaluate")
+
     def formula(self):
         """Returns string formula representing logical sentence."""
         return ""
 
     def symbols(self):
-        """Returns a set of all symbols in the logical sentence."""
-        return set()
+        """Returns a frozenset of all symbols in the logical sentence."""
+        try:
+            return self._symbols
+        except AttributeError:
+            symbols = frozenset().union(
+                *[operand.symbols() for operand in self.operands()]
+            )
+            object.__setattr__(self, "_symbols", symbols)
+            return symbols
+
+    def operands(self):
+        """Returns the tuple of sentences this sentence is built from."""
+        return ()
+
+    def __eq__(self, other):
+        return self is other
+
+    def __hash__(self):
+        return self._hash
+
+    def __setattr__(self, name, value):
+        raise AttributeError("sentences are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("sentences are immutable")
+
+    @classmethod
+    def intern(cls, key, **fields):
+        """
+        Returns the unique sentence of class `cls` identified by `key`,
+        creating it with attributes `fields` if it does not exist yet.
+        """
+        key = (cls.__name__.lower(), key)
+        sentence = Sentence.interned.get(key)
+        if sentence is None:
+            sentence = object.__new__(cls)
+            for name, value in fields.items():
+                object.__setattr__(sentence, name, value)
+            object.__setattr__(sentence, "_hash", hash(key))
+            Sentence.interned[key] = sentence
+        return sentence
 
     @classmethod
     def validate(cls, sentence):
@@ -44,14 +110,13 @@ class Sentence():
 
 class Symbol(Sentence):
 
-    def __init__(self, name):
-        self.name = name
+    __slots__ = ("name",)
 
-    def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
+    def __new__(cls, name):
+        return cls.intern(name, name=name)
 
-    def __hash__(self):
-        return hash(("symbol", self.name))
+    def __reduce__(self):
+        return (Symbol, (self.name,))
 
     def __repr__(self):
         return self.name
@@ -62,23 +127,30 @@ class Symbol(Sentence):
         except KeyError:
             raise Exception(f"variable {self.name} not in model")
 
+    def partial_evaluate(self, model):
+        return model.get(self.name)
+
     def formula(self):
         return self.name
 
     def symbols(self):
-        return {self.name}
+        try:
+            return self._symbols
+        except AttributeError:
+            object.__setattr__(self, "_symbols", frozenset([self.name]))
+            return self._symbols
 
 
 class Not(Sentence):
-    def __init__(self, operand):
-        Sentence.validate(operand)
-        self.operand = operand
 
-    def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
+    __slots__ = ("operand",)
 
-    def __hash__(self):
-        return hash(("not", hash(self.operand)))
+    def __new__(cls, operand):
+        Sentence.validate(operand)
+        return cls.intern(operand, operand=operand)
+
+    def __reduce__(self):
+        return (Not, (self.operand,))
 
     def __repr__(self):
         return f"Not({self.operand})"
@@ -86,26 +158,28 @@ class Not(Sentence):
     def evaluate(self, model):
         return not self.operand.evaluate(model)
 
+    def partial_evaluate(self, model):
+        value = self.operand.partial_evaluate(model)
+        return None if value is None else not value
+
     def formula(self):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
-    def symbols(self):
-        return self.operand.symbols()
+    def operands(self):
+        return (self.operand,)
 
 
 class And(Sentence):
-    def __init__(self, *conjuncts):
+
+    __slots__ = ("conjuncts",)
+
+    def __new__(cls, *conjuncts):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
-        self.conjuncts = list(conjuncts)
-
-    def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
+        return cls.intern(conjuncts, conjuncts=conjuncts)
 
-    def __hash__(self):
-        return hash(
-            ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
-        )
+    def __reduce__(self):
+        return (And, self.conjuncts)
 
     def __repr__(self):
         conjunctions = ", ".join(
@@ -114,35 +188,43 @@ class And(Sentence):
         return f"And({conjunctions})"
 
     def add(self, conjunct):
-        Sentence.validate(conjunct)
-        self.conjuncts.append(conjunct)
+        raise TypeError("sentences are immutable, "
+                        "use And(*sentence.conjuncts, conjunct) instead")
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
 
+    def partial_evaluate(self, model):
+        result = True
+        for conjunct in self.conjuncts:
+            value = conjunct.partial_evaluate(model)
+            if value is False:
+                return False
+            if value is None:
+                result = None
+        return result
+
     def formula(self):
         if len(self.conjuncts) == 1:
             return self.conjuncts[0].formula()
         return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
                            for conjunct in self.conjuncts])
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+    def operands(self):
+        return self.conjuncts
 
 
 class Or(Sentence):
-    def __init__(self, *disjuncts):
+
+    __slots__ = ("disjuncts",)
+
+    def __new__(cls, *disjuncts):
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
-        self.disjuncts = list(disjuncts)
-
-    def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
+        return cls.intern(disjuncts, disjuncts=disjuncts)
 
-    def __hash__(self):
-        return hash(
-            ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
-        )
+    def __reduce__(self):
+        return (Or, self.disjuncts)
 
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
@@ -151,30 +233,40 @@ class Or(Sentence):
     def evaluate(self, model):
         return any(disjunct.evaluate(model) for disjunct in self.disjuncts)
 
+    def partial_evaluate(self, model):
+        result = False
+        for disjunct in self.disjuncts:
+            value = disjunct.partial_evaluate(model)
+            if value is True:
+                return True
+            if value is None:
+                result = None
+        return result
+
     def formula(self):
         if len(self.disjuncts) == 1:
             return self.disjuncts[0].formula()
         return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
                             for disjunct in self.disjuncts])
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+    def operands(self):
+        return self.disjuncts
 
 
 class Implication(Sentence):
-    def __init__(self, antecedent, consequent):
+
+    __slots__ = ("antecedent", "consequent")
+
+    def __new__(cls, antecedent, consequent):
         Sentence.validate(antecedent)
         Sentence.validate(consequent)
-        self.antecedent = antecedent
-        self.consequent = consequent
-
-    def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
+        return cls.intern(
+            (antecedent, consequent),
+            antecedent=antecedent, consequent=consequent
+        )
 
-    def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
+    def __reduce__(self):
+        return (Implication, (self.antecedent, self.consequent))
 
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
@@ -183,29 +275,39 @@ class Implication(Sentence):
         return ((not self.antecedent.evaluate(model))
                 or self.consequent.evaluate(model))
 
+    def partial_evaluate(self, model):
+        antecedent = self.antecedent.partial_evaluate(model)
+        if antecedent is False:
+            return True
+        consequent = self.consequent.partial_evaluate(model)
+        if consequent is True:
+            return True
+        if antecedent is None or consequent is None:
+            return None
+        return False
+
     def formula(self):
         antecedent = Sentence.parenthesize(self.antecedent.formula())
         consequent = Sentence.parenthesize(self.consequent.formula())
         return f"{antecedent} => {consequent}"
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+    def operands(self):
+        return (self.antecedent, self.consequent)
 
 
 class Biconditional(Sentence):
-    def __init__(self, left, right):
+
+    __slots__ = ("left", "right")
+
+    def __new__(cls, left, right):
         Sentence.validate(left)
         Sentence.validate(right)
-        self.left = left
-        self.right = right
+        return cls.intern(
+            (left, right), left=left, right=right
+        )
 
-    def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
-
-    def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
+    def __reduce__(self):
+        return (Biconditional, (self.left, self.right))
 
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
@@ -216,17 +318,26 @@ class Biconditional(Sentence):
                 or (not self.left.evaluate(model)
                     and not self.right.evaluate(model)))
 
+    def partial_evaluate(self, model):
+        left = self.left.partial_evaluate(model)
+        if left is None:
+            return None
+        right = self.right.partial_evaluate(model)
+        if right is None:
+            return None
+        return left == right
+
     def formula(self):
         left = Sentence.parenthesize(str(self.left))
         right = Sentence.parenthesize(str(self.right))
         return f"{left} <=> {right}"
 
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
+    def operands(self):
+        return (self.left, self.right)
 
 
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
+def enumerate_check(knowledge, query):
+    """Checks if knowledge base entails query by enumerating every model."""
 
     def check_all(knowledge, query, symbols, model):
         """Checks if knowledge base entails query, given a particular model."""
@@ -257,7 +368,368 @@ def model_check(knowledge, query):
                     check_all(knowledge, query, remaining, model_false))
 
     # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
+    symbols = set(knowledge.symbols() | query.symbols())
 
     # Check that knowledge entails query
     return check_all(knowledge, query, symbols, dict())
+
+
+def symbol_frequencies(sentence, counts=None):
+    """Returns a dict counting how often each symbol occurs in sentence."""
+    if counts is None:
+        counts = dict()
+    if isinstance(sentence, Symbol):
+        counts[sentence.name] = counts.get(sentence.name, 0) + 1
+    for operand in sentence.operands():
+        symbol_frequencies(operand, counts)
+    return counts
+
+
+def prune_check(knowledge, query):
+    """
+    Checks if knowledge base entails query by enumerating models,
+    assigning the most frequent symbols first and abandoning a branch
+    as soon as a partial model makes the knowledge base false or the
+    query true.
+    """
+    counts = symbol_frequencies(knowledge)
+    symbol_frequencies(query, counts)
+    symbols = sorted(counts, key=lambda name: (-counts[name], name))
+    model = dict()
+
+    def check_all(index):
+        """Checks entailment in every completion of the partial model."""
+        kb = knowledge.partial_evaluate(model)
+        if kb is False:
+            return True
+        q = query.partial_evaluate(model)
+        if q is True:
+            return True
+        if kb is True and q is False:
+            return False
+
+        # Otherwise some symbol is still unassigned
+        p = symbols[index]
+        for value in (True, False):
+            model[p] = value
+            if not check_all(index + 1):
+                del model[p]
+                return False
+        del model[p]
+        return True
+
+    return check_all(0)
+
+
+# Set by any worker process that finds a counter-model
+stop_event = None
+
+# Number of models a worker checks between looking at stop_event
+STOP_CHECK_INTERVAL = 1024
+
+
+def init_worker(event):
+    """Stores the shared stop event in a worker process."""
+    global stop_event
+    stop_event = event
+
+
+def check_models(knowledge, query, symbols, model):
+    """
+    Checks entailment in every model that extends `model` with values
+    for `symbols`. Returns False as soon as a counter-model is found,
+    and gives up early, returning None, if another worker found one.
+    """
+    for i, values in enumerate(
+        itertools.product((True, False), repeat=len(symbols))
+    ):
+        if i % STOP_CHECK_INTERVAL == 0 and stop_event.is_set():
+            return None
+        model.update(zip(symbols, values))
+        if knowledge.evaluate(model) and not query.evaluate(model):
+            stop_event.set()
+            return False
+    return True
+
+
+def parallel_check(knowledge, query, split=None, workers=None):
+    """
+    Checks if knowledge base entails query by enumerating every model
+    on a process pool. The first `split` symbols are fixed in each of
+    the 2**split sub-problems. All workers stop as soon as any of them
+    finds a model of the knowledge base where the query is false.
+    """
+    symbols = sorted(knowledge.symbols() | query.symbols())
+    workers = workers or os.cpu_count() or 1
+    if split is None:
+        split = math.ceil(math.log2(workers * 4))
+    split = min(split, len(symbols))
+
+    event = multiprocessing.Event()
+    executor = ProcessPoolExecutor(
+        max_workers=workers, initializer=init_worker, initargs=(event,)
+    )
+    try:
+        futures = [
+            executor.submit(check_models, knowledge, query, symbols[split:],
+                            dict(zip(symbols[:split], prefix)))
+            for prefix in itertools.product((True, False), repeat=split)
+        ]
+        for future in as_completed(futures):
+            if future.result() is False:
+                return False
+        return True
+    finally:
+        event.set()
+        executor.shutdown(cancel_futures=True)
+
+
+def tseitin(sentence, solver, variables, cache):
+    """
+    Adds clauses to `solver` defining a literal equivalent to `sentence`,
+    and returns that literal. `variables` maps symbol names to solver
+    variables and `cache` maps already encoded subtrees to their literals.
+    """
+    if sentence in cache:
+        return cache[sentence]
+
+    if isinstance(sentence, Symbol):
+        if sentence.name not in variables:
+            variables[sentence.name] = solver.new_var()
+        lit = variables[sentence.name]
+    elif isinstance(sentence, Not):
+        lit = -tseitin(sentence.operand, solver, variables, cache)
+    elif isinstance(sentence, (And, Or)):
+        operands = (sentence.conjuncts if isinstance(sentence, And)
+                    else sentence.disjuncts)
+        lits = [tseitin(operand, solver, variables, cache)
+                for operand in operands]
+
+        # Or is encoded as the negation of And over negated operands
+        if isinstance(sentence, Or):
+            lits = [-l for l in lits]
+        lit = solver.new_var()
+        for l in lits:
+            solver.add_clause([-lit, l])
+        solver.add_clause([lit] + [-l for l in lits])
+        if isinstance(sentence, Or):
+            lit = -lit
+    elif isinstance(sentence, Implication):
+        a = tseitin(sentence.antecedent, solver, variables, cache)
+        b = tseitin(sentence.consequent, solver, variables, cache)
+        lit = solver.new_var()
+        solver.add_clause([-lit, -a, b])
+        solver.add_clause([lit, a])
+        solver.add_clause([lit, -b])
+    elif isinstance(sentence, Biconditional):
+        a = tseitin(sentence.left, solver, variables, cache)
+        b = tseitin(sentence.right, solver, variables, cache)
+        lit = solver.new_var()
+        solver.add_clause([-lit, -a, b])
+        solver.add_clause([-lit, a, -b])
+        solver.add_clause([lit, a, b])
+        solver.add_clause([lit, -a, -b])
+    else:
+        raise TypeError("must be a logical sentence")
+
+    cache[sentence] = lit
+    return lit
+
+
+def sat_check(knowledge, query):
+    """
+    Checks if knowledge base entails query by showing that
+    knowledge ∧ ¬query is unsatisfiable.
+    """
+    return knowledge_base(knowledge).sat_entails(query)
+
+
+# Number of symbols evaluated together as bits of one integer
+CHUNK_BITS = 16
+
+
+def compile_sentence(sentence, symbols):
+    """
+    Compiles `sentence` into a Python function `f(columns, mask)`.
+
+    `symbols` is the ordered list of symbol names, and `columns[i]` is
+    an integer whose bits hold the value of symbol i in many models at
+    once. The function returns an integer whose bits hold the value of
+    the sentence in each of those models. `mask` has a bit set for
+    every model. With `mask` equal to 1 and each column 0 or 1, the
+    function evaluates a single model.
+    """
+    index = {name: i for i, name in enumerate(symbols)}
+    lines = []
+    names = dict()
+
+    def emit(node):
+        if node in names:
+            return names[node]
+        if isinstance(node, Symbol):
+            expression = f"s[{index[node.name]}]"
+        elif isinstance(node, Not):
+            expression = f"m & ~{emit(node.operand)}"
+        elif isinstance(node, And):
+            operands = [emit(conjunct) for conjunct in node.conjuncts]
+            expression = " & ".join(operands) if operands else "m"
+        elif isinstance(node, Or):
+            operands = [emit(disjunct) for disjunct in node.disjuncts]
+            expression = " | ".join(operands) if operands else "0"
+        elif isinstance(node, Implication):
+            antecedent = emit(node.antecedent)
+            consequent = emit(node.consequent)
+            expression = f"m & (~{antecedent} | {consequent})"
+        elif isinstance(node, Biconditional):
+            left = emit(node.left)
+            right = emit(node.right)
+            expression = f"m & ~({left} ^ {right})"
+        else:
+            raise TypeError("must be a logical sentence")
+        name = f"t{len(lines)}"
+        lines.append(f"    {name} = {expression}")
+        names[node] = name
+        return name
+
+    result = emit(sentence)
+    source = "\n".join(
+        ["def evaluate(s, m):"] + lines + [f"    return {result}", ""]
+    )
+    namespace = dict()
+    exec(compile(source, "<sentence>", "exec"), namespace)
+    return namespace["evaluate"]
+
+
+def symbol_columns(n):
+    """
+    Returns the columns of a truth table over `n` symbols: integers of
+    2**n bits where bit k of column i is bit i of k.
+    """
+    columns = []
+    size = 1 << n
+    for i in range(n):
+        width = 1 << (i + 1)
+        column = ((1 << (1 << i)) - 1) << (1 << i)
+        while width < size:
+            column |= column << width
+            width <<= 1
+        columns.append(column)
+    return columns
+
+
+def chunks(n):
+    """
+    Yields `(columns, mask)` pairs that together cover every model
+    over `n` symbols, 2**CHUNK_BITS models at a time. The first symbols
+    vary within a chunk and the rest are fixed for each chunk.
+    """
+    low = min(n, CHUNK_BITS)
+    columns = symbol_columns(low)
+    mask = (1 << (1 << low)) - 1
+    for high in range(1 << (n - low)):
+        fixed = [mask if high >> i & 1 else 0 for i in range(n - low)]
+        yield columns + fixed, mask
+
+
+def compiled_check(knowledge, query):
+    """
+    Checks if knowledge base entails query by compiling
+    knowledge ∧ ¬query and evaluating it on every model at once,
+    in chunks of 2**CHUNK_BITS models.
+    """
+    return knowledge_base(knowledge).compiled_entails(query)
+
+
+class KnowledgeBase():
+    """
+    Caches everything about a knowledge base that entailment checks
+    can share: its symbols, an incremental SAT solver holding its
+    clauses, and the bits of its satisfying models.
+    """
+
+    def __init__(self, knowledge):
+        Sentence.validate(knowledge)
+        self.knowledge = knowledge
+        self.symbols = sorted(knowledge.symbols())
+        self.solver = None
+        self.variables = dict()
+        self.cache = dict()
+        self.models = None
+
+    def sat_entails(self, query):
+        """Checks entailment with assumptions on one shared solver."""
+        if self.solver is None:
+            self.solver = Solver()
+            self.solver.add_clause(
+                [tseitin(self.knowledge, self.solver, self.variables,
+                         self.cache)]
+            )
+        lit = tseitin(query, self.solver, self.variables, self.cache)
+        return self.solver.solve([-lit]) is None
+
+    def compiled_entails(self, query):
+        """Checks entailment against the cached bits of every model."""
+
+        # Queries with new symbols need the larger model space
+        extra = query.symbols() - set(self.symbols)
+        if extra:
+            symbols = self.symbols + sorted(extra)
+            evaluate = compile_sentence(And(self.knowledge, Not(query)),
+                                        symbols)
+            return not any(evaluate(columns, mask)
+                           for columns, mask in chunks(len(symbols)))
+
+        if self.models is None:
+            evaluate = compile_sentence(self.knowledge, self.symbols)
+            self.models = [evaluate(columns, mask)
+                           for columns, mask in chunks(len(self.symbols))]
+        evaluate = compile_sentence(query, self.symbols)
+        return not any(
+            models & ~evaluate(columns, mask)
+            for models, (columns, mask) in zip(
+                self.models, chunks(len(self.symbols))
+            )
+        )
+
+
+@functools.lru_cache(maxsize=32)
+def knowledge_base(knowledge):
+    """Returns the cached KnowledgeBase for a knowledge sentence."""
+    return KnowledgeBase(knowledge)
+
+
+ENGINES = {
+    "enumerate": enumerate_check,
+    "sat": sat_check,
+    "compiled": compiled_check,
+    "prune": prune_check,
+    "parallel": parallel_check,
+}
+
+
+def model_check(knowledge, query, engine="sat"):
+    """
+    Checks if knowledge base entails query.
+    `engine` names one of the entailment checks in ENGINES.
+    """
+    try:
+        check = ENGINES[engine]
+    except KeyError:
+        raise ValueError(f"unknown engine {engine}")
+    return check(knowledge, query)
+
+
+def model_check_all(knowledge, queries, engine="sat"):
+    """
+    Checks which of `queries` the knowledge base entails,
+    returning a list of booleans in the same order.
+    Engines that can reuse work across queries share one
+    cached KnowledgeBase.
+    """
+    if engine == "sat":
+        kb = knowledge_base(knowledge)
+        return [kb.sat_entails(query) for query in queries]
+    if engine == "compiled":
+        kb = knowledge_base(knowledge)
+        return [kb.compiled_entails(query) for query in queries]
+    return [model_check(knowledge, query, engine) for query in queries]
@@ -0,0 +1,264 @@
+"""
+A small CDCL SAT solver over integer clauses.
+
+Variables are positive integers and literals are signed integers,
+so `-3` is the negation of variable 3. Clauses are lists of literals.
+The solver uses two watched literals per clause for unit propagation,
+first-UIP clause learning with non-chronological backjumping,
+activity-based branching with phase saving, and geometric restarts.
+Assumptions can be passed to `solve`, so one solver can answer many
+related queries while keeping everything it has learned.
+"""
+
+import heapq
+
+
+class Solver():
+
+    def __init__(self):
+        self.num_vars = 0
+        self.clauses = []
+        self.watches = {}
+        self.assignment = [None]
+        self.level = [0]
+        self.reason = [None]
+        self.phase = [False]
+        self.activity = [0.0]
+        self.order = []
+        self.increment = 1.0
+        self.trail = []
+        self.trail_lim = []
+        self.qhead = 0
+        self.unsat = False
+        self.conflicts = 0
+
+    def new_var(self):
+        """Returns a new variable."""
+        self.num_vars += 1
+        var = self.num_vars
+        self.watches[var] = []
+        self.watches[-var] = []
+        self.assignment.append(None)
+        self.level.append(0)
+        self.reason.append(None)
+        self.phase.append(False)
+        self.activity.append(0.0)
+        heapq.heappush(self.order, (0.0, var))
+        return var
+
+    def value(self, lit):
+        """Returns True, False, or None if literal is unassigned."""
+        a = self.assignment[abs(lit)]
+        if a is None:
+            return None
+        return a if lit > 0 else not a
+
+    def decision_level(self):
+        return len(self.trail_lim)
+
+    def add_clause(self, clause):
+        """Adds a clause. Returns False if the solver is now unsatisfiable."""
+        if self.unsat:
+            return False
+        self.cancel_until(0)
+        literals = []
+        for lit in clause:
+            if -lit in literals or self.value(lit) is True:
+                return True
+            if lit not in literals and self.value(lit) is not False:
+                literals.append(lit)
+        if not literals:
+            self.unsat = True
+        elif len(literals) == 1:
+            self.enqueue(literals[0], None)
+            self.unsat = self.propagate() is not None
+        else:
+            self.attach(literals)
+        return not self.unsat
+
+    def attach(self, clause):
+        """Stores a clause and watches its first two literals."""
+        index = len(self.clauses)
+        self.clauses.append(clause)
+        self.watches[clause[0]].append(index)
+        self.watches[clause[1]].append(index)
+        return index
+
+    def enqueue(self, lit, reason):
+        var = abs(lit)
+        self.assignment[var] = lit > 0
+        self.level[var] = self.decision_level()
+        self.reason[var] = reason
+        self.trail.append(lit)
+
+    def propagate(self):
+        """
+        Propagates all enqueued literals.
+        Returns the index of a conflicting clause, or None.
+        """
+        while self.qhead < len(self.trail):
+            false_lit = -self.trail[self.qhead]
+            self.qhead += 1
+            watchers = self.watches[false_lit]
+            self.watches[false_lit] = kept = []
+            i = 0
+            while i < len(watchers):
+                index = watchers[i]
+                i += 1
+                clause = self.clauses[index]
+
+                # Keep the false literal in position 1
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], clause[0]
+                first = clause[0]
+                if self.value(first) is True:
+                    kept.append(index)
+                    continue
+
+                # Look for a new literal to watch
+                for k in range(2, len(clause)):
+                    if self.value(clause[k]) is not False:
+                        clause[1], clause[k] = clause[k], clause[1]
+                        self.watches[clause[1]].append(index)
+                        break
+                else:
+
+                    # Clause is unit or conflicting
+                    kept.append(index)
+                    if self.value(first) is False:
+                        kept.extend(watchers[i:])
+                        self.qhead = len(self.trail)
+                        return index
+                    self.enqueue(first, index)
+        return None
+
+    def analyze(self, conflict):
+        """
+        Returns a learned clause and the level to backjump to,
+        using the first unique implication point.
+        """
+        learnt = [None]
+        seen = set()
+        counter = 0
+        lit = None
+        index = len(self.trail) - 1
+        clause = self.clauses[conflict]
+        while True:
+            for q in (clause if lit is None else clause[1:]):
+                var = abs(q)
+                if var not in seen and self.level[var] > 0:
+                    seen.add(var)
+                    self.bump(var)
+                    if self.level[var] == self.decision_level():
+                        counter += 1
+                    else:
+                        learnt.append(q)
+
+            # Walk back along the trail to the next marked literal
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            lit = self.trail[index]
+            index -= 1
+            counter -= 1
+            if counter == 0:
+                break
+            clause = self.clauses[self.reason[abs(lit)]]
+        learnt[0] = -lit
+
+        # Backjump to the second-highest level in the clause
+        if len(learnt) == 1:
+            return learnt, 0
+        highest = max(range(1, len(learnt)),
+                      key=lambda k: self.level[abs(learnt[k])])
+        learnt[1], learnt[highest] = learnt[highest], learnt[1]
+        return learnt, self.level[abs(learnt[1])]
+
+    def bump(self, var):
+        self.activity[var] += self.increment
+        if self.activity[var] > 1e100:
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.increment *= 1e-100
+            self.order = [(-self.activity[v], v)
+                          for v in range(1, self.num_vars + 1)]
+            heapq.heapify(self.order)
+        elif self.assignment[var] is None:
+            heapq.heappush(self.order, (-self.activity[var], var))
+
+    def cancel_until(self, level):
+        """Undoes all assignments above decision level `level`."""
+        if self.decision_level() <= level:
+            return
+        for lit in self.trail[self.trail_lim[level]:]:
+            var = abs(lit)
+            self.phase[var] = lit > 0
+            self.assignment[var] = None
+            self.reason[var] = None
+            heapq.heappush(self.order, (-self.activity[var], var))
+        del self.trail[self.trail_lim[level]:]
+        del self.trail_lim[level:]
+        self.qhead = len(self.trail)
+
+    def pick_branch(self):
+        """Returns the unassigned variable with highest activity, or None."""
+        while self.order:
+            _, var = heapq.heappop(self.order)
+            if self.assignment[var] is None:
+                return var
+        return None
+
+    def solve(self, assumptions=()):
+        """
+        Returns a satisfying model as a dict mapping each variable
+        to a boolean, or None if the clauses are unsatisfiable
+        together with the assumed literals.
+        """
+        if self.unsat:
+            return None
+        self.cancel_until(0)
+        restart = 100
+        conflicts = 0
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                conflicts += 1
+                if self.decision_level() == 0:
+                    self.unsat = True
+                    return None
+                learnt, level = self.analyze(conflict)
+                self.cancel_until(level)
+                if len(learnt) == 1:
+                    self.enqueue(learnt[0], None)
+                else:
+                    self.enqueue(learnt[0], self.attach(learnt))
+                self.increment /= 0.95
+                continue
+
+            if conflicts >= restart:
+                conflicts = 0
+                restart = int(restart * 1.5)
+                self.cancel_until(0)
+                continue
+
+            # Decide assumptions first, one per decision level
+            if self.decision_level() < len(assumptions):
+                lit = assumptions[self.decision_level()]
+                value = self.value(lit)
+                if value is False:
+                    self.cancel_until(0)
+                    return None
+                self.trail_lim.append(len(self.trail))
+                if value is None:
+                    self.enqueue(lit, None)
+                continue
+
+            var = self.pick_branch()
+            if var is None:
+                model = {
+                    v: self.assignment[v]
+                    for v in range(1, self.num_vars + 1)
+                }
+                self.cancel_until(0)
+                return model
+            self.trail_lim.append(len(self.trail))
+            self.enqueue(var if self.phase[var] else -var, None)
@@ -1,5 +1,157 @@
 import itertools
+import math
 import random
+from collections import deque, namedtuple
+
+
+# Largest group of connected cells whose configurations are enumerated
+MAX_COMPONENT_CELLS = 40
+
+# Number of enumerated components remembered between moves
+COMPONENT_CACHE_SIZE = 1024
+
+# Assumed probability that a cell is a mine when the total is unknown
+DENSITY = 0.16
+
+# Random cells tried before listing every unconstrained cell
+RANDOM_PROBES = 16
+
+# Operations counted in MinesweeperAI.stats
+STATS = (
+    "moves",
+    "mines_marked",
+    "safes_marked",
+    "sentences_touched",
+    "sentences_added",
+    "sentences_removed",
+    "sentences_resolved",
+    "duplicates",
+    "subset_inferences",
+)
+
+
+class Bitboard():
+    """
+    Set of cells on a `height` x `width` board, stored as one bit per
+    cell in a bytearray. Adding, removing and testing a cell take
+    constant time, and unions, intersections and differences of
+    whole boards are single bitwise operations on Python integers.
+    """
+
+    __slots__ = ("height", "width", "data")
+
+    def __init__(self, height, width, cells=()):
+        self.height = height
+        self.width = width
+        self.data = bytearray((height * width + 7) // 8)
+        for cell in cells:
+            self.add(cell)
+
+    def index(self, cell):
+        """
+        Returns the bit index of `cell`, or None if it is off the board.
+        """
+        i, j = cell
+        if 0 <= i < self.height and 0 <= j < self.width:
+            return i * self.width + j
+        return None
+
+    def add(self, cell):
+        k = self.index(cell)
+        if k is None:
+            raise ValueError(f"{cell} is not on the board")
+        self.data[k >> 3] |= 1 << (k & 7)
+
+    def discard(self, cell):
+        k = self.index(cell)
+        if k is not None:
+            self.data[k >> 3] &= ~(1 << (k & 7))
+
+    def remove(self, cell):
+        if cell not in self:
+            raise KeyError(cell)
+        self.discard(cell)
+
+    def __contains__(self, cell):
+        i, j = cell
+        if 0 <= i < self.height and 0 <= j < self.width:
+            k = i * self.width + j
+            return bool(self.data[k >> 3] >> (k & 7) & 1)
+        return False
+
+    def bits(self):
+        """Returns the board as one integer with a bit per cell."""
+        return int.from_bytes(self.data, "little")
+
+    def from_bits(self, bits):
+        """Returns a Bitboard of the same size holding `bits`."""
+        board = Bitboard(self.height, self.width)
+        board.data[:] = bits.to_bytes(len(board.data), "little")
+        return board
+
+    def __len__(self):
+        return self.bits().bit_count()
+
+    def __bool__(self):
+        return self.data.count(0) != len(self.data)
+
+    def __iter__(self):
+        for byte_index, byte in enumerate(self.data):
+            while byte:
+                low = byte & -byte
+                k = (byte_index << 3) + low.bit_length() - 1
+                yield divmod(k, self.width)
+                byte ^= low
+
+    def __or__(self, other):
+        return self.from_bits(self.bits() | other.bits())
+
+    def __and__(self, other):
+        return self.from_bits(self.bits() & other.bits())
+
+    def __sub__(self, other):
+        return self.from_bits(self.bits() & ~other.bits())
+
+    def __invert__(self):
+        full = (1 << (self.height * self.width)) - 1
+        return self.from_bits(full & ~self.bits())
+
+    def __eq__(self, other):
+        if isinstance(other, Bitboard):
+            return (self.height, self.width, self.data) == (
+                other.height, other.width, other.data
+            )
+        try:
+            return len(self) == len(other) and all(c in self for c in other)
+        except TypeError:
+            return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(set(self))
+
+    def copy(self):
+        board = Bitboard(self.height, self.width)
+        board.data[:] = self.data
+        return board
+
+    def choice(self):
+        """
+        Returns a random cell in the set, or None if it is empty.
+        Searches for a set bit starting from a random position, so the
+        result is not uniform but needs no scan in Python.
+        """
+        bits = self.bits()
+        if not bits:
+            return None
+        start = random.randrange(self.height * self.width)
+        above = bits >> start
+        if above:
+            k = start + (above & -above).bit_length() - 1
+        else:
+            k = (bits & -bits).bit_length() - 1
+        return divmod(k, self.width)
 
 
 class Minesweeper():
@@ -12,26 +164,56 @@ class Minesweeper():
         # Set initial width, height, and number of mines
         self.height = height
         self.width = width
-        self.mines = set()
-
-        # Initialize an empty field with no mines
-        self.board = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
+        self.mines = Bitboard(height, width)
 
         # Add mines randomly
-        while len(self.mines) != mines:
+        placed = 0
+        while placed != mines:
             i = random.randrange(height)
             j = random.randrange(width)
-            if not self.board[i][j]:
+            if (i, j) not in self.mines:
                 self.mines.add((i, j))
-                self.board[i][j] = True
+                placed += 1
+
+        # Count every cell's neighboring mines at once
+        self.counts = self.neighbor_counts()
 
         # At first, player has found no mines
-        self.mines_found = set()
+        self.mines_found = Bitboard(height, width)
+
+    @property
+    def board(self):
+        """
+        The mines as a list of rows, with True where there is a mine.
+        """
+        return [[(i, j) in self.mines for j in range(self.width)]
+                for i in range(self.height)]
+
+    def neighbor_counts(self):
+        """
+        Returns the number of neighboring mines of every cell, packed
+        four bits per cell into bytes, row by row with a stride of
+        `width + 1`.
+
+        The mines are laid out the same way in one integer, with an
+        always-empty column after each row so that shifts do not wrap
+        around edges. Adding the eight copies of that integer shifted
+        by each neighbor offset convolves the board with the 3x3
+        neighborhood; counts never exceed 8, so no cell carries into
+        the next.
+        """
+        stride = self.width + 1
+        packed = bytearray((self.height * stride + 1) // 2)
+        for i, j in self.mines:
+            k = i * stride + j
+            packed[k >> 1] |= 1 << (4 * (k & 1))
+        mines = int.from_bytes(packed, "little")
+
+        counts = 0
+        for offset in (1, stride - 1, stride, stride + 1):
+            counts += (mines >> (4 * offset)) + (mines << (4 * offset))
+        counts &= (1 << (8 * len(packed))) - 1
+        return counts.to_bytes(len(packed), "little")
 
     def print(self):
         """
@@ -41,7 +223,7 @@ class Minesweeper():
         for i in range(self.height):
             print("--" * self.width + "-")
             for j in range(self.width):
-                if self.board[i][j]:
+                if (i, j) in self.mines:
                     print("|X", end="")
                 else:
                     print("| ", end="")
@@ -49,8 +231,7 @@ class Minesweeper():
         print("--" * self.width + "-")
 
     def is_mine(self, cell):
-        i, j = cell
-        return self.board[i][j]
+        return cell in self.mines
 
     def nearby_mines(self, cell):
         """
@@ -58,24 +239,9 @@ class Minesweeper():
         within one row and column of a given cell,
         not including the cell itself.
         """
-
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
-
-        return count
+        i, j = cell
+        k = i * (self.width + 1) + j
+        return self.counts[k >> 1] >> (4 * (k & 1)) & 15
 
     def won(self):
         """
@@ -166,81 +332,348 @@ class Sentence():
             self.cells.remove(cell)
 
 
+class FrozenSentence(namedtuple("FrozenSentence", ["cells", "count"])):
+    """
+    Immutable, hashable logical statement about a Minesweeper game:
+    `count` of the cells in the frozenset `cells` are mines.
+    Used by MinesweeperAI so that equal sentences are stored once.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, cells, count):
+        return super().__new__(cls, frozenset(cells), count)
+
+    def __repr__(self):
+        return f"{set(self.cells)} = {self.count}"
+
+    def known_mines(self):
+        """
+        Returns the set of all cells in self.cells known to be mines.
+        """
+        return set(self.cells) if len(self.cells) == self.count else set()
+
+    def known_safes(self):
+        """
+        Returns the set of all cells in self.cells known to be safe.
+        """
+        return set(self.cells) if self.count == 0 else set()
+
+
+class LinearSystem():
+    """
+    Linear equations over cells, each saying that the cells weighted
+    by integer coefficients add up to an integer total, where every
+    cell is 0 (safe) or 1 (mine).
+
+    Equations are kept in reduced row echelon form with fraction-free
+    integer elimination: each row has a pivot cell that appears in no
+    other row. Adding an equation or assigning a cell only touches the
+    rows involved. Rows changed since the last call to `deductions`
+    are checked with bounds reasoning, which finds cells whose value
+    is forced even when no single sentence decides them.
+    """
+
+    def __init__(self):
+
+        # Coefficients and total of each row, keyed by its pivot cell
+        self.rows = dict()
+        self.totals = dict()
+
+        # For each cell, the pivots of the rows that mention it
+        self.columns = dict()
+
+        # Pivots of rows changed since the last deductions
+        self.dirty = set()
+
+    def add(self, coefficients, total):
+        """
+        Adds the equation sum(coefficients[c] * c) == total.
+        """
+        row = dict(coefficients)
+        for pivot in [c for c in row if c in self.rows]:
+            total = self.eliminate(row, total, pivot)
+        total = normalize_row(row, total)
+        if not row:
+            return
+
+        pivot = min(row)
+        if row[pivot] < 0:
+            row = {c: -a for c, a in row.items()}
+            total = -total
+
+        # Remove the new pivot from every other row
+        for other in list(self.columns.get(pivot, ())):
+            self.unindex(other)
+            self.totals[other] = self.eliminate(
+                self.rows[other], self.totals[other], pivot, row, total
+            )
+            self.totals[other] = normalize_row(
+                self.rows[other], self.totals[other]
+            )
+            self.index(other)
+
+        self.rows[pivot] = row
+        self.totals[pivot] = total
+        self.index(pivot)
+
+    def eliminate(self, row, total, pivot, source=None, source_total=None):
+        """
+        Removes `pivot` from `row` in place using the pivot's row, or
+        `source` if given, and returns the new total.
+        """
+        if source is None:
+            source = self.rows[pivot]
+            source_total = self.totals[pivot]
+        a = source[pivot]
+        b = row[pivot]
+        for c in row:
+            row[c] *= a
+        for c, coefficient in source.items():
+            value = row.get(c, 0) - b * coefficient
+            if value:
+                row[c] = value
+            else:
+                row.pop(c, None)
+        return a * total - b * source_total
+
+    def index(self, pivot):
+        for c in self.rows[pivot]:
+            self.columns.setdefault(c, set()).add(pivot)
+        self.dirty.add(pivot)
+
+    def unindex(self, pivot):
+        for c in self.rows[pivot]:
+            self.columns[c].discard(pivot)
+            if not self.columns[c]:
+                del self.columns[c]
+        self.dirty.discard(pivot)
+
+    def assign(self, cell, value):
+        """
+        Substitutes a known value (0 or 1) for `cell` in every row.
+        """
+        for pivot in list(self.columns.get(cell, ())):
+            self.unindex(pivot)
+            row = self.rows[pivot]
+            total = self.totals[pivot] - row.pop(cell) * value
+            if pivot == cell:
+
+                # The row lost its pivot, so insert what is left again
+                del self.rows[pivot]
+                del self.totals[pivot]
+                self.add(row, total)
+            else:
+                self.totals[pivot] = normalize_row(row, total)
+                if row:
+                    self.index(pivot)
+                else:
+                    del self.rows[pivot]
+                    del self.totals[pivot]
+
+    def deductions(self):
+        """
+        Returns a dict of cells whose value is forced by a changed row.
+
+        For a row sum(a * c) == total, every choice of the other cells
+        gives a sum between the sum of their negative coefficients and
+        the sum of their positive ones. A value of a cell is impossible
+        if the total falls outside that range once the cell's own term
+        is added.
+        """
+        forced = dict()
+        for pivot in self.dirty:
+            row = self.rows[pivot]
+            total = self.totals[pivot]
+            low = sum(a for a in row.values() if a < 0)
+            high = sum(a for a in row.values() if a > 0)
+            for c, a in row.items():
+                rest_low = low - min(a, 0)
+                rest_high = high - max(a, 0)
+                can_be_safe = rest_low <= total <= rest_high
+                can_be_mine = rest_low + a <= total <= rest_high + a
+                if can_be_safe != can_be_mine:
+                    forced[c] = int(can_be_mine)
+        self.dirty.clear()
+        return forced
+
+
+def normalize_row(row, total):
+    """
+    Divides a row and its total in place by the greatest common divisor
+    of its coefficients, and returns the new total.
+    """
+    divisor = math.gcd(*row.values())
+    if divisor > 1:
+        for c in row:
+            row[c] //= divisor
+        total //= divisor
+    return total
+
+
 class MinesweeperAI():
     """
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, mines=None, deduction="subset"):
 
-        # Set initial height and width
+        # Set initial height and width, and total number of mines if known
         self.height = height
         self.width = width
+        self.total_mines = mines
 
         # Keep track of which cells have been clicked on
-        self.moves_made = set()
+        self.moves_made = Bitboard(height, width)
 
         # Keep track of cells known to be safe or mines
-        self.mines = set()
-        self.safes = set()
+        self.mines = Bitboard(height, width)
+        self.safes = Bitboard(height, width)
+
+        # Safe cells that have not been clicked on yet
+        self.pending = Bitboard(height, width)
+
+        # Set of sentences about the game known to be true,
+        # and for each cell the sentences that mention it
+        self.knowledge = set()
+        self.index = dict()
+
+        # Sentences waiting to be simplified, stored and combined
+        self.worklist = deque()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # Mine configurations of each group of connected sentences
+        self.component_cache = dict()
+
+        # With "gauss" deduction, all sentences also form one linear
+        # system whose elimination finds what the subset rule misses
+        if deduction not in ("subset", "gauss"):
+            raise ValueError(f"unknown deduction {deduction}")
+        self.system = LinearSystem() if deduction == "gauss" else None
+
+        # Number of times each operation in STATS has been done
+        self.stats = dict.fromkeys(STATS, 0)
 
     def mark_mine(self, cell):
         """
         Marks a cell as a mine, and updates all knowledge
         to mark that cell as a mine as well.
         """
+        if cell in self.mines:
+            return
         self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        self.stats["mines_marked"] += 1
+        if self.system:
+            self.system.assign(cell, 1)
+        for sentence in self.index.pop(cell, ()):
+            self.stats["sentences_touched"] += 1
+            self.remove_sentence(sentence, cell)
+            self.worklist.append(
+                FrozenSentence(sentence.cells - {cell}, sentence.count - 1)
+            )
 
     def mark_safe(self, cell):
         """
         Marks a cell as safe, and updates all knowledge
         to mark that cell as safe as well.
         """
+        if cell in self.safes:
+            return
         self.safes.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
+        if cell not in self.moves_made:
+            self.pending.add(cell)
+        self.stats["safes_marked"] += 1
+        if self.system:
+            self.system.assign(cell, 0)
+        for sentence in self.index.pop(cell, ()):
+            self.stats["sentences_touched"] += 1
+            self.remove_sentence(sentence, cell)
+            self.worklist.append(
+                FrozenSentence(sentence.cells - {cell}, sentence.count)
+            )
 
     def neighbors(self, cell):
+        """
+        Returns the cells within one row and column of `cell`,
+        not including the cell itself.
+        """
         rc = set()
         for r in range(cell[0]-1, cell[0]+2):
             for c in range(cell[1]-1, cell[1]+2):
                 if r >= 0 and r < self.height and c >= 0 and c < self.width:
-                    n = (r,c)
-                    if not n in self.moves_made and not n in self.safes and not n in self.mines:
-                        rc.add((r,c))
-
+                    if (r, c) != cell:
+                        rc.add((r, c))
         return rc
 
-    def infer_safes(self):
-        to_remove = []
-        for s in self.knowledge:
-            if s.count == 0:
-                to_remove.append(s)
-                for c in s.cells.copy():
-                    self.mark_safe(c)
-                
-    def infer_mines(self):
-        to_remove = []
-        for s in self.knowledge:
-            if s.count == len(s.cells):
-                to_remove.append(s)
-                for c in s.cells.copy():
-                    self.mark_mine(c)
-                
-    def cleanup_knowledge(self):
-        to_remove = []
-        for s in self.knowledge:
-            if not s.cells:
-                assert not s.count
-                to_remove.append(s)
-        for r in to_remove:
-            self.knowledge.remove(r)
-            
+    def remove_sentence(self, sentence, skip=None):
+        """
+        Removes `sentence` from the knowledge base and from the index
+        of every cell it mentions, except `skip`.
+        """
+        self.knowledge.discard(sentence)
+        self.stats["sentences_removed"] += 1
+        for c in sentence.cells:
+            if c != skip:
+                self.index[c].discard(sentence)
+                if not self.index[c]:
+                    del self.index[c]
+
+    def add_sentence(self, sentence):
+        """
+        Stores a new sentence, after removing cells already known to be
+        safe or mines. Sentences that determine all of their cells are
+        resolved at once instead of being stored. Queues the sentences
+        that follow from the subset rule with every stored sentence
+        that shares a cell with it.
+        """
+        cells = set(sentence.cells)
+        count = sentence.count
+        for c in sentence.cells:
+            if c in self.mines:
+                cells.remove(c)
+                count -= 1
+            elif c in self.safes:
+                cells.remove(c)
+        if not cells:
+            return
+        if count == 0:
+            self.stats["sentences_resolved"] += 1
+            for c in cells:
+                self.mark_safe(c)
+            return
+        if count == len(cells):
+            self.stats["sentences_resolved"] += 1
+            for c in cells:
+                self.mark_mine(c)
+            return
+
+        sentence = FrozenSentence(cells, count)
+        if sentence in self.knowledge:
+            self.stats["duplicates"] += 1
+            return
+
+        # Only sentences sharing a cell can be subsets of each other
+        related = set()
+        for c in cells:
+            related.update(self.index.get(c, ()))
+        for other in related:
+            if other.cells < sentence.cells:
+                self.stats["subset_inferences"] += 1
+                self.worklist.append(FrozenSentence(
+                    sentence.cells - other.cells, count - other.count
+                ))
+            elif sentence.cells < other.cells:
+                self.stats["subset_inferences"] += 1
+                self.worklist.append(FrozenSentence(
+                    other.cells - sentence.cells, other.count - count
+                ))
+
+        self.knowledge.add(sentence)
+        self.stats["sentences_added"] += 1
+        for c in cells:
+            self.index.setdefault(c, set()).add(sentence)
+        if self.system:
+            self.system.add({c: 1 for c in cells}, count)
+
     def add_knowledge(self, cell, count):
         """
         Called when the Minesweeper board tells us, for a given
@@ -255,28 +688,26 @@ class MinesweeperAI():
                if it can be concluded based on the AI's knowledge base
             5) add any new sentences to the AI's knowledge base
                if they can be inferred from existing knowledge
+
+        New and changed sentences go through a worklist, so each
+        move only revisits sentences that share cells with them.
+        With "gauss" deduction, cells forced by the linear system are
+        marked too, until neither finds anything new.
         """
+        self.stats["moves"] += 1
         self.moves_made.add(cell)
+        self.pending.discard(cell)
         self.mark_safe(cell)
-        group = self.neighbors(cell)
-        s = Sentence(group, count)
-        self.knowledge.append(s)
-#        self.infer_safes()
-#        self.infer_mines()
-        new_knowledge = []
-        for s in self.knowledge:
-            for t in self.knowledge:
-                if s == t:
-                    continue
-                if s.cells.issubset(t.cells):
-                    set_diff = t.cells - s.cells
-                    count_diff = t.count - s.count
-                    if set_diff:
-                        new_knowledge.append(Sentence(set_diff, count_diff))
-        self.knowledge.extend(new_knowledge)
-        self.infer_safes()
-        self.infer_mines()
-        self.cleanup_knowledge()
+        self.worklist.append(FrozenSentence(self.neighbors(cell), count))
+        while self.worklist:
+            while self.worklist:
+                self.add_sentence(self.worklist.popleft())
+            if self.system:
+                for c, value in self.system.deductions().items():
+                    if value:
+                        self.mark_mine(c)
+                    else:
+                        self.mark_safe(c)
 
     def make_safe_move(self):
         """
@@ -287,10 +718,7 @@ class MinesweeperAI():
         This function may use the knowledge in self.mines, self.safes
         and self.moves_made, but should not modify any of those values.
         """
-        choices = self.safes - self.moves_made
-        if choices:
-            return random.choice(list(choices))
-        return None
+        return self.pending.choice()
 
     def make_random_move(self):
         """
@@ -298,10 +726,228 @@ class MinesweeperAI():
         Should choose randomly among cells that:
             1) have not already been chosen, and
             2) are not known to be mines
+
+        Among those cells, picks one with the lowest probability of
+        being a mine according to mine_probabilities, breaking ties
+        at random.
+        """
+        probabilities, other = self.mine_probabilities()
+        best = None
+        best_key = (math.inf, 0)
+        for cell, p in probabilities.items():
+            key = (p, random.random())
+            if key < best_key:
+                best, best_key = cell, key
+        if other is not None and (best is None or other < best_key[0]):
+            best = self.unconstrained_cell()
+        return best
+
+    def unconstrained_cell(self):
+        """
+        Returns a random unknown cell that no sentence mentions,
+        or None. Tries a few random cells first, which almost always
+        succeeds early in the game, before listing every candidate.
         """
-        choices = set([(i,j) for i in range(self.height) for j in range(self.width)])
-        choices = choices - self.moves_made
-        choices = choices - self.mines
-        if choices:
-            return random.choice(list(choices))
+        decided = self.moves_made | self.mines | self.safes
+        for _ in range(RANDOM_PROBES):
+            cell = (random.randrange(self.height),
+                    random.randrange(self.width))
+            if cell not in decided and cell not in self.index:
+                return cell
+        candidates = [c for c in ~decided if c not in self.index]
+        if candidates:
+            return random.choice(candidates)
         return None
+
+    def components(self):
+        """
+        Splits the knowledge base into groups of sentences that share
+        no cells with other groups, returning a list of frozensets.
+        """
+        groups = []
+        seen = set()
+        for start in self.knowledge:
+            if start in seen:
+                continue
+            seen.add(start)
+            group = [start]
+            frontier = [start]
+            while frontier:
+                sentence = frontier.pop()
+                for c in sentence.cells:
+                    for other in self.index[c]:
+                        if other not in seen:
+                            seen.add(other)
+                            group.append(other)
+                            frontier.append(other)
+            groups.append(frozenset(group))
+        return groups
+
+    def enumerate_component(self, sentences):
+        """
+        Counts the mine configurations consistent with `sentences`.
+
+        Returns a dict mapping each possible number of mines `m` to a
+        pair `(configurations, cell_counts)`, where `cell_counts` maps
+        each cell to the number of those configurations in which it
+        is a mine. Results are memoized, since most components are
+        unchanged from one move to the next.
+        """
+        if sentences in self.component_cache:
+            return self.component_cache[sentences]
+
+        sentences = list(sentences)
+        cells = sorted(set().union(*(s.cells for s in sentences)))
+        if len(cells) > MAX_COMPONENT_CELLS:
+            return None
+        constraints = [[k for k, s in enumerate(sentences) if c in s.cells]
+                       for c in cells]
+        need = [s.count for s in sentences]
+        left = [len(s.cells) for s in sentences]
+        assignment = []
+        results = dict()
+
+        def backtrack(i, mines):
+            if i == len(cells):
+                entry = results.setdefault(mines, [0, [0] * len(cells)])
+                entry[0] += 1
+                for k, value in enumerate(assignment):
+                    entry[1][k] += value
+                return
+            for value in (0, 1):
+                for k in constraints[i]:
+                    need[k] -= value
+                    left[k] -= 1
+                if all(0 <= need[k] <= left[k] for k in constraints[i]):
+                    assignment.append(value)
+                    backtrack(i + 1, mines + value)
+                    assignment.pop()
+                for k in constraints[i]:
+                    need[k] += value
+                    left[k] += 1
+
+        backtrack(0, 0)
+        results = {
+            m: (configurations, dict(zip(cells, counts)))
+            for m, (configurations, counts) in results.items()
+        }
+        if len(self.component_cache) >= COMPONENT_CACHE_SIZE:
+            self.component_cache.clear()
+        self.component_cache[frozenset(sentences)] = results
+        return results
+
+    def mine_probabilities(self):
+        """
+        Returns `(probabilities, other)`. `probabilities` maps every
+        cell mentioned by a sentence to the probability that it is a
+        mine, and `other` is the probability for each remaining unknown
+        cell, or None if there are no such cells.
+
+        The sentences are split into independent components and the
+        consistent configurations of each are enumerated. If the total
+        number of mines is known, components are combined by weighting
+        each choice of per-component mine counts by the number of ways
+        to place the remaining mines among the other unknown cells.
+        Otherwise each cell is assumed to be a mine with probability
+        DENSITY, independently of the others.
+        """
+        probabilities = dict()
+        polynomials = []
+        cell_counts = []
+        for sentences in self.components():
+            results = self.enumerate_component(sentences)
+            if not results:
+
+                # Too large to enumerate: use each sentence's own ratio
+                for sentence in sentences:
+                    p = sentence.count / len(sentence.cells)
+                    for c in sentence.cells:
+                        probabilities[c] = max(probabilities.get(c, 0), p)
+                continue
+
+            # Scale counts so that products of many components stay finite
+            largest = max(n for n, _ in results.values())
+            polynomials.append(
+                {m: n / largest for m, (n, _) in results.items()}
+            )
+            cell_counts.append({
+                m: {c: k / largest for c, k in counts.items()}
+                for m, (_, counts) in results.items()
+            })
+
+        unknown = (self.height * self.width - len(self.mines)
+                   - len(self.safes | self.moves_made))
+        outside = unknown - len(probabilities) - sum(
+            len(next(iter(counts.values()))) for counts in cell_counts
+        )
+
+        # Weight of a total of `m` mines among the enumerated cells
+        if self.total_mines is not None:
+            remaining = (self.total_mines - len(self.mines)
+                         - round(sum(probabilities.values())))
+            logs = {
+                m: log_comb(outside, remaining - m)
+                for m in range(remaining + 1)
+            }
+            base = max(logs.values(), default=-math.inf)
+        if self.total_mines is None or base == -math.inf:
+            odds = DENSITY / (1 - DENSITY)
+
+            def weight(m):
+                return odds ** m
+        else:
+            def weight(m):
+                if m > remaining:
+                    return 0
+                return math.exp(logs[m] - base)
+
+        # Configurations of every component except one, for each one
+        prefix = [{0: 1.0}]
+        for polynomial in polynomials:
+            prefix.append(convolve(prefix[-1], polynomial))
+        suffix = [{0: 1.0}]
+        for polynomial in reversed(polynomials):
+            suffix.append(convolve(suffix[-1], polynomial))
+        suffix.reverse()
+
+        total = prefix[-1]
+        z = sum(n * weight(m) for m, n in total.items())
+        if not z:
+            return probabilities, (DENSITY if outside > 0 else None)
+
+        for i, counts in enumerate(cell_counts):
+            others = convolve(prefix[i], suffix[i + 1])
+            for m, cells in counts.items():
+                w = sum(n * weight(m + k) for k, n in others.items()) / z
+                for c, k in cells.items():
+                    probabilities[c] = probabilities.get(c, 0) + k * w
+
+        if outside <= 0:
+            return probabilities, None
+        if self.total_mines is None or base == -math.inf:
+            return probabilities, DENSITY
+        expected = sum(n * weight(m) * (remaining - m)
+                       for m, n in total.items()) / z
+        return probabilities, expected / outside
+
+
+def convolve(a, b):
+    """
+    Multiplies two polynomials given as dicts from exponent to
+    coefficient.
+    """
+    product = dict()
+    for i, x in a.items():
+        for j, y in b.items():
+            product[i + j] = product.get(i + j, 0) + x * y
+    return product
+
+
+def log_comb(n, k):
+    """
+    Returns the natural logarithm of n choose k,
+    or -inf if there is no way to choose.
+    """
+    if k < 0 or k > n:
+        return -math.inf
+    return math.lgamma(n + 1) - math.lgamma(k + 1) - math.lgamma(n - k + 1)
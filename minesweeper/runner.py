@@ -41,7 +41,7 @@ try:
     
     # Create game and AI agent
     game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
-    ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
+    ai = MinesweeperAI(height=HEIGHT, width=WIDTH, mines=MINES)
     
     # Keep track of revealed cells, flagged cells, and if a mine was hit
     revealed = set()
@@ -197,7 +197,7 @@ try:
             # Reset game state
             elif resetButton.collidepoint(mouse):
                 game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
-                ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
+                ai = MinesweeperAI(height=HEIGHT, width=WIDTH, mines=MINES)
                 revealed = set()
                 flags = set()
                 lost = False
@@ -0,0 +1,179 @@
+"""
+Headless Minesweeper simulator for benchmarking MinesweeperAI.
+
+Plays many seeded games of Minesweeper against the AI on a process pool,
+without pygame, and reports the win rate, the number of moves per
+second, percentiles of how long the AI takes per move, and how many
+knowledge base operations of each kind the AI does per move.
+
+Usage: python simulate.py [--games N] [--height H] [--width W]
+                          [--mines M] [--workers K] [--seed S]
+                          [--deduction subset|gauss]
+"""
+
+import argparse
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from minesweeper import Minesweeper, MinesweeperAI
+
+# Latency histogram buckets per doubling of time
+BUCKETS_PER_OCTAVE = 8
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--height", type=int, default=8)
+    parser.add_argument("--width", type=int, default=8)
+    parser.add_argument("--mines", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk", type=int, default=100,
+                        help="games per worker task")
+    parser.add_argument("--deduction", choices=["subset", "gauss"],
+                        default="subset")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = simulate(args.games, args.height, args.width, args.mines,
+                     args.seed, args.workers, args.chunk,
+                     args.deduction)
+    elapsed = time.perf_counter() - start
+
+    print(f"Games:          {stats['games']}")
+    print(f"Win rate:       {stats['wins'] / stats['games']:.2%}")
+    print(f"Moves:          {stats['moves']}")
+    print(f"Moves/second:   {stats['moves'] / elapsed:,.0f} (wall clock)")
+    print(f"Moves/second:   {stats['moves'] / stats['ai_time']:,.0f} "
+          "(per worker, AI time only)")
+    for q in (50, 90, 99, 99.9):
+        latency = percentile(stats["histogram"], q)
+        print(f"p{q:<5} latency: {latency * 1e6:,.1f} µs")
+    print("Operations per move:")
+    for name, count in stats["operations"].items():
+        print(f"    {name:<20} {count / max(stats['moves'], 1):,.2f}")
+
+
+def play(height, width, mines, seed, histogram, deduction="subset"):
+    """
+    Plays one game with all randomness seeded by `seed`, adding the
+    time the AI spends on each move to `histogram`.
+    Returns `(won, moves, ai_time, operations)`, where `operations` is
+    the AI's count of each kind of knowledge base operation.
+    """
+    random.seed(seed)
+    game = Minesweeper(height=height, width=width, mines=mines)
+    ai = MinesweeperAI(height=height, width=width, mines=mines,
+                       deduction=deduction)
+    remaining = height * width - mines
+    moves = 0
+    ai_time = 0.0
+
+    while remaining:
+        start = time.perf_counter()
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_random_move()
+        if move is None:
+            return False, moves, ai_time, ai.stats
+        if game.is_mine(move):
+            ai_time += record(histogram, start)
+            return False, moves + 1, ai_time, ai.stats
+        ai.add_knowledge(move, game.nearby_mines(move))
+        ai_time += record(histogram, start)
+        moves += 1
+        remaining -= 1
+
+    return True, moves, ai_time, ai.stats
+
+
+def record(histogram, start):
+    """
+    Adds the time since `start` to a logarithmic histogram,
+    and returns it.
+    """
+    elapsed = time.perf_counter() - start
+    bucket = math.floor(math.log2(max(elapsed, 1e-9)) * BUCKETS_PER_OCTAVE)
+    histogram[bucket] = histogram.get(bucket, 0) + 1
+    return elapsed
+
+
+def play_games(height, width, mines, seeds, deduction="subset"):
+    """
+    Plays one game per seed in `seeds` and returns their combined stats.
+    """
+    stats = {"games": 0, "wins": 0, "moves": 0, "ai_time": 0.0,
+             "histogram": dict(), "operations": dict()}
+    for seed in seeds:
+        won, moves, ai_time, operations = play(
+            height, width, mines, seed, stats["histogram"], deduction
+        )
+        stats["games"] += 1
+        stats["wins"] += won
+        stats["moves"] += moves
+        stats["ai_time"] += ai_time
+        add_counts(stats["operations"], operations)
+    return stats
+
+
+def merge(total, stats):
+    """
+    Adds the stats of one batch of games to `total`.
+    """
+    for key in ("games", "wins", "moves", "ai_time"):
+        total[key] += stats[key]
+    add_counts(total["histogram"], stats["histogram"])
+    add_counts(total["operations"], stats["operations"])
+
+
+def add_counts(total, counts):
+    """
+    Adds each count in `counts` to the same key in `total`.
+    """
+    for key, count in counts.items():
+        total[key] = total.get(key, 0) + count
+
+
+def simulate(games, height, width, mines, seed=0, workers=None, chunk=100,
+             deduction="subset"):
+    """
+    Plays `games` games on a process pool, seeding game `i` with
+    `seed + i` so that results are reproducible, and returns the
+    combined stats.
+    """
+    total = {"games": 0, "wins": 0, "moves": 0, "ai_time": 0.0,
+             "histogram": dict(), "operations": dict()}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(play_games, height, width, mines,
+                            range(seed + i, seed + min(i + chunk, games)),
+                            deduction)
+            for i in range(0, games, chunk)
+        ]
+        for future in futures:
+            merge(total, future.result())
+    return total
+
+
+def percentile(histogram, q):
+    """
+    Returns the upper edge, in seconds, of the histogram bucket
+    containing the `q`th percentile.
+    """
+    count = sum(histogram.values())
+    if not count:
+        return 0.0
+    target = count * q / 100
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        if seen >= target:
+            return 2 ** ((bucket + 1) / BUCKETS_PER_OCTAVE)
+    return 2 ** ((max(histogram) + 1) / BUCKETS_PER_OCTAVE)
+
+
+if __name__ == "__main__":
+    main()
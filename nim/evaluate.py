@@ -0,0 +1,138 @@
+"""
+Evaluation harness for NimAI against the exact Nim-sum strategy.
+
+Reports three things:
+    - training throughput, in games per second, of nim.train and of
+      the batched trainer
+    - how often a trained AI's greedy action is a winning move, over
+      every reachable state that has one
+    - time to optimal: how many games and seconds of batched training
+      it takes to play optimally in a target share of the winnable
+      states, for larger piles
+
+Usage: python evaluate.py [--games N] [--budget SECONDS] [--target T]
+                          [--seed S]
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import time
+from array import array
+
+from nim import NimAI, agreement, optimal_actions, train
+from trainer import learn, train_batched
+
+# Initial piles timed to optimal play, smallest first
+SIZES = [
+    [1, 3, 5, 7],
+    [2, 4, 6, 8],
+    [1, 3, 5, 7, 9],
+    [3, 5, 7, 9],
+]
+
+# Games played by nim.train when timing it
+SEQUENTIAL_GAMES = 5000
+
+# Games of batched training between agreement checks
+CHECK_EVERY = 10000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--games", type=int, default=100000,
+                        help="games of batched training to evaluate")
+    parser.add_argument("--budget", type=float, default=30.0,
+                        help="seconds of training per size before giving up")
+    parser.add_argument("--target", type=float, default=1.0,
+                        help="agreement counted as optimal")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("Throughput")
+    random.seed(args.seed)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        train(SEQUENTIAL_GAMES)
+    elapsed = time.perf_counter() - start
+    print(f"    nim.train     {SEQUENTIAL_GAMES / elapsed:>10,.0f} games/s")
+    start = time.perf_counter()
+    ai = train_batched(args.games, seed=args.seed)
+    elapsed = time.perf_counter() - start
+    print(f"    train_batched {args.games / elapsed:>10,.0f} games/s")
+
+    print()
+    print(f"Agreement after {args.games} games")
+    winnable, losing = count_states(ai)
+    print(f"    {winnable} states with a winning move, {losing} without")
+    rate = agreement(ai)
+    if rate is not None:
+        print(f"    greedy action wins in {rate:.2%} of them")
+
+    print()
+    print("Time to optimal")
+    print(f"    {'piles':<16}{'states':>8}{'games':>10}{'seconds':>10}"
+          f"{'games/s':>10}{'agreement':>11}")
+    for initial in SIZES:
+        games, seconds, reached = time_to_optimal(
+            initial, args.budget, args.target, args.seed
+        )
+        states = NimAI(initial=initial).states.count
+        label = " ".join(str(pile) for pile in initial)
+        if reached is None:
+            print(f"    {label:<16}{states:>8}{'-':>10}{'-':>10}{'-':>10}"
+                  f"{'n/a':>11}")
+            continue
+        if reached < args.target:
+            seconds_label = f">{args.budget:g}"
+        else:
+            seconds_label = f"{seconds:.2f}"
+        print(f"    {label:<16}{states:>8}{games:>10}{seconds_label:>10}"
+              f"{games / seconds:>10,.0f}{reached:>11.2%}")
+
+
+def count_states(ai):
+    """
+    Returns how many nonempty reachable states have a winning move,
+    and how many have none.
+    """
+    winnable = sum(
+        1 for index in range(1, ai.states.count)
+        if optimal_actions(ai.states.decode(index))
+    )
+    return winnable, ai.states.count - 1 - winnable
+
+
+def time_to_optimal(initial, budget, target=1.0, seed=0, alpha=0.5,
+                    epsilon=0.1, batch=64):
+    """
+    Trains an AI for the piles `initial` in steps of CHECK_EVERY games
+    until its greedy action wins in at least a `target` share of the
+    winnable states, or `budget` seconds of training have passed.
+
+    Returns `(games, seconds, agreement)`: the games and seconds of
+    training, not counting the checks, and the agreement reached.
+    The agreement is None, with no training, if no state has a
+    winning move.
+    """
+    ai = NimAI(alpha=alpha, epsilon=epsilon, initial=initial)
+    if agreement(ai) is None:
+        return 0, 0.0, None
+    counts = array("d", bytes(len(ai.q) * 8))
+    rng = random.Random(seed)
+    games = 0
+    seconds = 0.0
+    reached = 0.0
+    while seconds < budget and reached < target:
+        start = time.perf_counter()
+        learn(ai.states, ai.q, counts, CHECK_EVERY, batch, alpha, epsilon,
+              rng)
+        seconds += time.perf_counter() - start
+        games += CHECK_EVERY
+        reached = agreement(ai)
+    return games, seconds, reached
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
 import math
+import os
 import random
 import time
+from array import array
+
+# Directory trained models are saved in
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
 
 
 class Nim():
@@ -70,22 +75,119 @@ class Nim():
             self.winner = self.player
 
 
-class NimAI():
+class NimStates():
+
+    def __init__(self, initial=[1, 3, 5, 7]):
+        """
+        Dense integer encoding of the states and actions of Nim games
+        starting from the piles `initial`.
+
+        States are numbered in mixed radix, with pile `i` as a digit
+        in base `initial[i] + 1`, so every reachable state is an index
+        below `self.count`. Actions `(i, j)` are numbered in order in
+        `self.actions`. For each state, `self.available[state]` lists
+        the indices of its actions and `self.successors[state]` the
+        states they lead to.
+        """
+        self.initial = list(initial)
+        self.radices = []
+        self.count = 1
+        for pile in self.initial:
+            self.radices.append(self.count)
+            self.count *= pile + 1
+
+        self.actions = [
+            (i, j)
+            for i, pile in enumerate(self.initial)
+            for j in range(1, pile + 1)
+        ]
+        self.action_index = {
+            action: k for k, action in enumerate(self.actions)
+        }
+
+        self.available = []
+        self.successors = []
+        for state in range(self.count):
+            piles = self.decode(state)
+            available = []
+            successors = []
+            for k, (i, j) in enumerate(self.actions):
+                if j <= piles[i]:
+                    available.append(k)
+                    successors.append(state - j * self.radices[i])
+            self.available.append(available)
+            self.successors.append(successors)
+
+    def encode(self, piles):
+        """
+        Returns the index of the state with piles `piles`.
+        """
+        return sum(pile * radix for pile, radix in zip(piles, self.radices))
 
-    def __init__(self, alpha=0.5, epsilon=0.1):
+    def decode(self, state):
         """
-        Initialize AI with an empty Q-learning dictionary,
-        an alpha (learning) rate, and an epsilon rate.
+        Returns the list of piles of the state with index `state`.
+        """
+        return [
+            state // radix % (pile + 1)
+            for pile, radix in zip(self.initial, self.radices)
+        ]
+
 
-        The Q-learning dictionary maps `(state, action)`
-        pairs to a Q-value (a number).
-         - `state` is a tuple of remaining piles, e.g. (1, 1, 4, 4)
-         - `action` is a tuple `(i, j)` for an action
+class NimAI():
+
+    def __init__(self, alpha=0.5, epsilon=0.1, initial=[1, 3, 5, 7]):
+        """
+        Initialize AI with a Q-table of zeros for games starting
+        from the piles `initial`, an alpha (learning) rate, and an
+        epsilon rate.
+
+        The Q-table holds a Q-value (a number) for every
+        `(state, action)` pair in one flat array of doubles, at index
+        `state * len(self.states.actions) + action` where
+         - `state` is the NimStates index of a list of remaining piles
+         - `action` is the NimStates index of an action `(i, j)`
         """
-        self.q = dict()
+        self.states = NimStates(initial)
+        self.width = len(self.states.actions)
+        self.q = array("d", bytes(8 * self.states.count * self.width))
         self.alpha = alpha
         self.epsilon = epsilon
 
+    def index(self, state, action):
+        """
+        Return the Q-table index of the pair `(state, action)`.
+        """
+        return (self.states.encode(state) * self.width
+                + self.states.action_index[action])
+
+    def save(self, path):
+        """
+        Save the Q-table to `path`, after a one-line header
+        naming the initial piles it was trained for.
+        """
+        with open(path, "wb") as f:
+            header = " ".join(str(pile) for pile in self.states.initial)
+            f.write(f"nim {header}\n".encode())
+            self.q.tofile(f)
+
+    @classmethod
+    def load(cls, path, alpha=0.5, epsilon=0.1):
+        """
+        Return an AI with the Q-table saved at `path` by `save`.
+        """
+        with open(path, "rb") as f:
+            header = f.readline().split()
+            if not header or header[0] != b"nim":
+                raise Exception(f"{path} is not a Nim model")
+            ai = cls(alpha, epsilon, [int(pile) for pile in header[1:]])
+            data = f.read()
+        if len(data) != len(ai.q) * ai.q.itemsize:
+            raise Exception(f"{path} has the wrong number of Q-values")
+        ai.q = array("d")
+        ai.q.frombytes(data)
+        return ai
+
     def update(self, old_state, action, new_state, reward):
         """
         Update Q-learning model, given an old state, an action taken
@@ -101,10 +203,7 @@ class NimAI():
         Return the Q-value for the state `state` and the action `action`.
         If no Q-value exists yet in `self.q`, return 0.
         """
-        sa = (tuple(state),action)
-        if sa in self.q:
-            return self.q[sa]
-        return 0
+        return self.q[self.index(state, action)]
 
     def update_q_value(self, state, action, old_q, reward, future_rewards):
         """
@@ -121,9 +220,8 @@ class NimAI():
         `alpha` is the learning rate, and `new value estimate`
         is the sum of the current reward and estimated future rewards.
         """
-        sa = (tuple(state), action)
         update = old_q + self.alpha * ((reward + future_rewards) - old_q)
-        self.q[sa] = update
+        self.q[self.index(state, action)] = update
 
     def best_future_reward(self, state):
         """
@@ -135,13 +233,10 @@ class NimAI():
         Q-value in `self.q`. If there are no available actions in
         `state`, return 0.
         """
-        actions = Nim.available_actions(state)
-#        print(state, actions)
-        best_action = None
+        base = self.states.encode(state) * self.width
         best_value = 0
-        for a in actions:
-            sa = (tuple(state),a)
-            value = 0 if sa not in self.q else self.q[sa]
+        for a in self.states.available[self.states.encode(state)]:
+            value = self.q[base + a]
             if value > best_value:
                 best_value = value
         return best_value
@@ -161,26 +256,86 @@ class NimAI():
         If multiple actions have the same Q-value, any of those
         options is an acceptable return value.
         """
-        actions = Nim.available_actions(state)
+        index = self.states.encode(state)
+        actions = self.states.available[index]
         if epsilon:
             if random.random() < self.epsilon:
-                return random.choice(list(actions))
-        
+                return self.states.actions[random.choice(actions)]
+
+        base = index * self.width
         best_action = None
         best_value = -float('Inf')
         for a in actions:
-            sa = (tuple(state),a)
-            value = 0 if sa not in self.q else self.q[sa]
+            value = self.q[base + a]
             if value > best_value:
                 best_value = value
-                best_action = a
+                best_action = self.states.actions[a]
         return best_action
 
 
-def train(n):
+def optimal_actions(piles):
+    """
+    Return the set of actions that win from `piles` with perfect play,
+    where the player who takes the last object loses. The set is empty
+    if every action loses against a perfect opponent.
+
+    A position is lost for the player to move when its Nim-sum (the
+    XOR of the piles) is 0 and some pile has more than one object, or
+    when every pile has at most one object and an odd number have one.
+    """
+    winning = set()
+    for i, j in Nim.available_actions(piles):
+        after = list(piles)
+        after[i] -= j
+        if max(after) > 1:
+            nim_sum = 0
+            for pile in after:
+                nim_sum ^= pile
+            lost = nim_sum == 0
+        else:
+            lost = sum(after) % 2 == 1
+        if lost:
+            winning.add((i, j))
+    return winning
+
+
+def agreement(ai):
+    """
+    Return the fraction of states with a winning move, among all
+    states reachable from the AI's initial piles, in which the AI's
+    greedy action is a winning one, or None if no state has a
+    winning move, as when the initial piles are a single object.
+    """
+    winnable = 0
+    agreed = 0
+    for index in range(1, ai.states.count):
+        piles = ai.states.decode(index)
+        winning = optimal_actions(piles)
+        if winning:
+            winnable += 1
+            agreed += ai.choose_action(piles, epsilon=False) in winning
+    if not winnable:
+        return None
+    return agreed / winnable
+
+
+def model_path(initial=[1, 3, 5, 7]):
+    """
+    Return the path a model trained for the piles `initial` is saved at.
+    """
+    name = "-".join(str(pile) for pile in initial)
+    return os.path.join(MODEL_DIR, f"nim-{name}.q")
+
+
+def train(n, workers=1):
     """
     Train an AI by playing `n` games against itself.
+    With more than one worker, games are played in parallel
+    by trainer.train_parallel instead.
     """
+    if workers > 1:
+        from trainer import train_parallel
+        return train_parallel(n, workers=workers)
 
     player = NimAI()
 
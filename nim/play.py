@@ -1,4 +1,12 @@
-from nim import train, play
+import os
 
-ai = train(10000)
+from nim import NimAI, model_path, train, play
+
+# Train only if no model has been saved for the default piles
+path = model_path()
+if os.path.exists(path):
+    ai = NimAI.load(path)
+else:
+    ai = train(10000)
+    ai.save(path)
 play(ai)
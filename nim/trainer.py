@@ -0,0 +1,232 @@
+"""
+Batched Q-learning trainer for NimAI.
+
+Plays many self-play games in lock-step: at each step every unfinished
+game in a batch moves once, and all games in a batch have the same
+player to move. States and actions are dense integer indices from
+NimStates, and Q-values live in NimAI's flat array of doubles, so a move
+is a few list and array lookups instead of building sets of tuples.
+The learning rule is the same as NimAI.update. Games in a batch learn
+from each other's updates only one step at a time, so very large
+batches need more games to reach the same play.
+
+Self-play runs in rounds, on a process pool if there is more than one
+worker. Each worker trains a copy of the shared Q-table with its own
+epsilon and seed, and after every round the copies are merged by
+averaging each Q-value weighted by how many updates each worker made
+to it. Agreement with the optimal Nim-sum policy is reported after
+every round against wall-clock time.
+
+Usage: python trainer.py [--games N] [--batch B] [--workers W]
+                         [--rounds R] [--seed S]
+"""
+
+import argparse
+import random
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from nim import NimAI, agreement
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--batch", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--rounds", type=int, default=10,
+                        help="synchronizations of the workers' Q-tables")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+
+    def report(ai, games):
+        rate = agreement(ai)
+        label = "n/a" if rate is None else f"{rate:.2%}"
+        print(f"{time.perf_counter() - start:>8.2f} s {games:>10} games "
+              f"{label:>8} optimal")
+
+    ai = train_parallel(args.games, workers=args.workers,
+                        rounds=args.rounds, batch=args.batch,
+                        seed=args.seed, on_sync=report)
+    elapsed = time.perf_counter() - start
+    print(f"Trained on {args.games} games in {elapsed:.2f} s "
+          f"({args.games / elapsed:,.0f} games/s)")
+    print(f"{sum(1 for value in ai.q if value)} Q-values learned")
+
+
+def train_batched(n, initial=[1, 3, 5, 7], batch=64, alpha=0.5,
+                  epsilon=0.1, seed=None):
+    """
+    Trains an AI by playing `n` games against itself, `batch` games
+    at a time, and returns it.
+    """
+    player = NimAI(alpha=alpha, epsilon=epsilon, initial=initial)
+    counts = array("d", bytes(len(player.q) * 8))
+    learn(player.states, player.q, counts, n, batch, alpha, epsilon,
+          random.Random(seed))
+    return player
+
+
+def train_parallel(n, initial=[1, 3, 5, 7], workers=4, rounds=10, batch=64,
+                   alpha=0.5, epsilon=0.1, epsilons=None, seed=None,
+                   on_sync=None):
+    """
+    Trains an AI on `n` games of self-play split across `workers`
+    processes, merging their Q-tables `rounds` times, and returns it.
+
+    Worker `w` explores with `epsilons[w]`, which by default spreads
+    evenly around `epsilon`. After each merge, `on_sync(ai, games)`
+    is called if given, with the merged AI and the games played so far.
+    """
+    if epsilons is None:
+        epsilons = [2 * epsilon * (w + 1) / (workers + 1)
+                    for w in range(workers)]
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    player = NimAI(alpha=alpha, epsilon=epsilon, initial=initial)
+
+    # A single worker trains in this process, for comparison
+    executor = ProcessPoolExecutor(workers) if workers > 1 else None
+    played = 0
+    try:
+        for r in range(rounds):
+            games = n * (r + 1) // rounds - played
+            tasks = [
+                (initial, player.q.tobytes(),
+                 games * (w + 1) // workers - games * w // workers,
+                 batch, alpha, epsilons[w], seed + r * workers + w)
+                for w in range(workers)
+            ]
+            if executor is None:
+                results = [train_worker(*task) for task in tasks]
+            else:
+                futures = [executor.submit(train_worker, *task)
+                           for task in tasks]
+                results = [future.result() for future in futures]
+            merge(player.q, results)
+            played += games
+            if on_sync is not None:
+                on_sync(player, played)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return player
+
+
+def train_worker(initial, data, n, batch, alpha, epsilon, seed):
+    """
+    Trains a copy of the Q-table `data` on `n` games, and returns
+    the new table and how many times each Q-value was updated.
+    """
+    player = NimAI(alpha=alpha, epsilon=epsilon, initial=initial)
+    player.q = array("d")
+    player.q.frombytes(data)
+    counts = array("d", bytes(len(player.q) * 8))
+    learn(player.states, player.q, counts, n, batch, alpha, epsilon,
+          random.Random(seed))
+    return player.q.tobytes(), counts.tobytes()
+
+
+def merge(q, results):
+    """
+    Sets each value in `q` to the average of the workers' values,
+    weighted by how many times each worker updated it. Values no
+    worker updated are left as they are.
+    """
+    tables = []
+    for data, count_data in results:
+        table = array("d")
+        table.frombytes(data)
+        counts = array("d")
+        counts.frombytes(count_data)
+        tables.append((table, counts))
+    for i in range(len(q)):
+        total = 0.0
+        weight = 0.0
+        for table, counts in tables:
+            if counts[i]:
+                total += counts[i] * table[i]
+                weight += counts[i]
+        if weight:
+            q[i] = total / weight
+
+
+def learn(states, q, counts, n, batch, alpha, epsilon, rng):
+    """
+    Updates the flat Q-table `q`, indexed by `state * len(actions) +
+    action`, with `n` games of self-play, adding 1 to the same index
+    of `counts` for every update.
+    """
+    width = len(states.actions)
+
+    # Q-table indices of each state's actions, and where they lead
+    cells = [
+        [state * width + k for k in states.available[state]]
+        for state in range(states.count)
+    ]
+    successors = states.successors
+    initial = states.encode(states.initial)
+
+    def best_future(state):
+        # Like NimAI.best_future_reward, never less than 0
+        best = 0.0
+        for cell in cells[state]:
+            if q[cell] > best:
+                best = q[cell]
+        return best
+
+    played = 0
+    while played < n:
+        size = min(batch, n - played)
+        played += size
+        current = [initial] * size
+
+        # Q-table index of each player's last move in each game
+        last = [[None] * size, [None] * size]
+
+        active = range(size)
+        player = 0
+        while active:
+            still_playing = []
+            mine = last[player]
+            theirs = last[1 - player]
+            for g in active:
+                state = current[g]
+                options = cells[state]
+
+                # Epsilon-greedy choice, taking the first of equal values
+                if rng.random() < epsilon:
+                    k = rng.randrange(len(options))
+                else:
+                    values = [q[cell] for cell in options]
+                    k = values.index(max(values))
+                cell = options[k]
+                new_state = successors[state][k]
+                mine[g] = cell
+
+                if new_state == 0:
+
+                    # The player who took the last object loses
+                    q[cell] += alpha * (-1 - q[cell])
+                    counts[cell] += 1
+                    other = theirs[g]
+                    if other is not None:
+                        q[other] += alpha * (1 - q[other])
+                        counts[other] += 1
+                else:
+                    other = theirs[g]
+                    if other is not None:
+                        future = best_future(new_state)
+                        q[other] += alpha * (future - q[other])
+                        counts[other] += 1
+                    current[g] = new_state
+                    still_playing.append(g)
+            active = still_playing
+            player = 1 - player
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Microbenchmark of tictactoe move generation on list boards against
+bitboards.
+
+Walks the complete game tree from the initial state with each
+representation, counting every position visited, and reports nodes
+per second.
+
+Usage: python benchmark.py
+"""
+
+import time
+
+import bitboard
+import tictactoe as ttt
+
+
+def main():
+    for name, walk, start in [
+        ("list board", walk_list, ttt.initial_state()),
+        ("bitboard", walk_bits, bitboard.State()),
+    ]:
+        begin = time.perf_counter()
+        nodes = walk(start)
+        elapsed = time.perf_counter() - begin
+        print(f"{name:<12}{nodes:>10,} nodes {elapsed:>8.2f} s "
+              f"{nodes / elapsed:>12,.0f} nodes/s")
+
+
+def walk_list(board):
+    """
+    Returns the number of positions in the game tree below `board`,
+    using the list-board API of tictactoe.py.
+    """
+    if ttt.terminal(board):
+        return 1
+    return 1 + sum(
+        walk_list(ttt.result(board, action))
+        for action in ttt.actions(board)
+    )
+
+
+def walk_bits(state):
+    """
+    Returns the number of positions in the game tree below `state`,
+    making and unmaking moves in place.
+    """
+    if state.terminal():
+        return 1
+    nodes = 1
+    for bit in state.moves():
+        state.make(bit)
+        nodes += walk_bits(state)
+        state.unmake()
+    return nodes
+
+
+if __name__ == "__main__":
+    main()
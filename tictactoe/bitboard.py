@@ -0,0 +1,211 @@
+"""
+Tic Tac Toe on bitboards.
+
+A position is two 9-bit integers, one for X's cells and one for O's,
+where cell (i, j) is bit 3 * i + j. Wins are found by testing the
+eight line masks, moves are generated by peeling the lowest set bit
+off the empty cells, and a State makes and unmakes moves in place
+without copying the board.
+
+The list-board functions at the end mirror the API of tictactoe.py,
+so `import bitboard as ttt` also works in runner.py. There is no
+opening book or saved table here, so runner.py always searches.
+"""
+
+from tictactoe import X, O, EMPTY, LINES
+
+# Bits of all nine cells
+FULL = 0x1FF
+
+# One mask per row, column and diagonal
+WIN_MASKS = [sum(1 << k for k in line) for line in LINES]
+
+
+def wins(bits):
+    """
+    Returns True if `bits` covers a whole row, column or diagonal.
+    """
+    for mask in WIN_MASKS:
+        if bits & mask == mask:
+            return True
+    return False
+
+
+class State():
+    """
+    Mutable bitboard position with the player to move.
+    """
+
+    __slots__ = ("x", "o", "history")
+
+    def __init__(self, x=0, o=0):
+        self.x = x
+        self.o = o
+        self.history = []
+
+    def copy(self):
+        return State(self.x, self.o)
+
+    def x_to_move(self):
+        return self.x.bit_count() == self.o.bit_count()
+
+    def empty(self):
+        return FULL & ~(self.x | self.o)
+
+    def moves(self):
+        """
+        Yields the bit of each empty cell, lowest first.
+        """
+        free = self.empty()
+        while free:
+            bit = free & -free
+            yield bit
+            free ^= bit
+
+    def make(self, bit):
+        """
+        Plays the empty cell `bit` for the player to move.
+        """
+        if self.x_to_move():
+            self.x |= bit
+        else:
+            self.o |= bit
+        self.history.append(bit)
+
+    def unmake(self):
+        """
+        Takes back the last move made.
+        """
+        bit = self.history.pop()
+        self.x &= ~bit
+        self.o &= ~bit
+
+    def winner(self):
+        if wins(self.x):
+            return X
+        if wins(self.o):
+            return O
+        return None
+
+    def terminal(self):
+        return self.x | self.o == FULL or wins(self.x) or wins(self.o)
+
+    def utility(self):
+        return 1 if wins(self.x) else (-1 if wins(self.o) else 0)
+
+
+def negamax(state, alpha, beta):
+    """
+    Returns `(score, bit)` for the player to move in `state`, where
+    `score` is the utility from that player's point of view.
+    """
+    sign = 1 if state.x_to_move() else -1
+    if state.terminal():
+        return sign * state.utility(), None
+    best_score = -2
+    best_bit = None
+    for bit in state.moves():
+        state.make(bit)
+        score = -negamax(state, -beta, -alpha)[0]
+        state.unmake()
+        if score > best_score:
+            best_score, best_bit = score, bit
+        alpha = max(alpha, score)
+        if alpha >= beta:
+            break
+    return best_score, best_bit
+
+
+def from_board(board):
+    """
+    Returns the State of a list board.
+    """
+    x = o = 0
+    for i in range(3):
+        for j in range(3):
+            if board[i][j] == X:
+                x |= 1 << (3 * i + j)
+            elif board[i][j] == O:
+                o |= 1 << (3 * i + j)
+    return State(x, o)
+
+
+def to_board(state):
+    """
+    Returns the list board of a State.
+    """
+    return [
+        [
+            X if state.x >> (3 * i + j) & 1
+            else O if state.o >> (3 * i + j) & 1
+            else EMPTY
+            for j in range(3)
+        ]
+        for i in range(3)
+    ]
+
+
+def cell(bit):
+    """
+    Returns the (i, j) action of a single-bit move.
+    """
+    return divmod(bit.bit_length() - 1, 3)
+
+
+def initial_state():
+    """Returns starting state of the board."""
+    return to_board(State())
+
+
+def player(board):
+    """Returns player who has the next turn on a board."""
+    return X if from_board(board).x_to_move() else O
+
+
+def actions(board):
+    """Returns set of all possible actions (i, j) available on the board."""
+    return {cell(bit) for bit in from_board(board).moves()}
+
+
+def result(board, action):
+    """Returns the board that results from making move (i, j) on the board."""
+    state = from_board(board)
+    i, j = action
+    if not (0 <= i < 3 and 0 <= j < 3) or board[i][j]:
+        raise Exception(str(action) + ' is not a valid move')
+    state.make(1 << (3 * i + j))
+    return to_board(state)
+
+
+def winner(board):
+    """Returns the winner of the game, if there is one."""
+    return from_board(board).winner()
+
+
+def terminal(board):
+    """Returns True if game is over, False otherwise."""
+    return from_board(board).terminal()
+
+
+def utility(board):
+    """Returns 1 if X has won the game, -1 if O has won, 0 otherwise."""
+    return from_board(board).utility()
+
+
+def minimax(board):
+    """Returns the optimal action for the current player on the board."""
+    state = from_board(board)
+    if state.terminal():
+        return None
+    _, bit = negamax(state, -2, 2)
+    return cell(bit)
+
+
+def load_book(path=None):
+    """Returns False, since bitboard search uses no opening book."""
+    return False
+
+
+def load_table(path=None):
+    """Returns False, since bitboard search keeps no saved table."""
+    return False
@@ -0,0 +1,524 @@
+"""
+Generalized m,n,k game: two players take turns placing stones on an
+m x n board, and the first to get k in a row horizontally, vertically
+or diagonally wins. Tic Tac Toe is the 3,3,3 game and gomoku is
+15,15,5.
+
+The engine searches with negamax alpha-beta and iterative deepening
+under a time budget, so it always has a move ready when time runs out.
+Positions are cached in a transposition table keyed by Zobrist hashes,
+moves are ordered by the table's best move and a history heuristic,
+and positions at the depth limit are scored by counting open lines.
+
+With more than one worker, the root moves are split across a process
+pool. Each worker deepens its own share of the moves with a private
+transposition table, and the best move of the deepest iteration every
+worker completed is played.
+
+Usage: python mnk.py [--height M] [--width N] [-k K] [--time SECONDS]
+                     [--workers W]
+"""
+
+import argparse
+import functools
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+X = "X"
+O = "O"
+EMPTY = None
+
+# Score of a won position, less the number of moves it takes
+WIN = 1_000_000
+
+# Scores above this are wins found by the search, not heuristic values
+WIN_BOUND = WIN - 10_000
+
+# Transposition table bound types
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Only cells this close to a stone are searched
+RADIUS = 2
+
+# Share of the time budget kept free for returning the move, since
+# the search only stops at the first node after its deadline
+SAFETY_MARGIN = 0.1
+
+
+class Timeout(Exception):
+    pass
+
+
+class Game():
+    """
+    m,n,k game position, stored as one bitboard per player with cell
+    (i, j) at bit i * width + j. Moves are made and unmade in place,
+    updating the Zobrist hash and the set of cells near a stone.
+    """
+
+    def __init__(self, height=3, width=3, k=3, seed=0):
+        if k > max(height, width):
+            raise ValueError(f"no {k} in a row fits on {height}x{width}")
+        self.height = height
+        self.width = width
+        self.k = k
+        self.size = height * width
+        self.full = (1 << self.size) - 1
+        self.windows, self.windows_at, self.nearby, self.zobrist = geometry(
+            height, width, k, seed
+        )
+
+        self.stones = [0, 0]
+        self.hash = 0
+        self.history = []
+        self.near = [0]
+
+    @classmethod
+    def from_board(cls, board, k):
+        """
+        Returns the Game of a list board of X, O and EMPTY cells.
+        """
+        game = cls(len(board), len(board[0]), k)
+        xs = [(i, j) for i, row in enumerate(board)
+              for j, cell in enumerate(row) if cell == X]
+        os = [(i, j) for i, row in enumerate(board)
+              for j, cell in enumerate(row) if cell == O]
+        if len(os) > len(xs) or len(xs) > len(os) + 1:
+            raise ValueError("not a reachable board")
+        for index, (i, j) in enumerate(xs):
+            game.make(i * game.width + j)
+            if index < len(os):
+                game.make(os[index][0] * game.width + os[index][1])
+        return game
+
+    def turn(self):
+        """
+        Returns 0 if X is to move and 1 if O is.
+        """
+        return len(self.history) & 1
+
+    def empty(self):
+        return self.full & ~(self.stones[0] | self.stones[1])
+
+    def make(self, cell):
+        turn = self.turn()
+        self.stones[turn] |= 1 << cell
+        self.hash ^= self.zobrist[turn][cell]
+        self.history.append(cell)
+        self.near.append(self.near[-1] | self.nearby[cell])
+
+    def unmake(self):
+        cell = self.history.pop()
+        self.near.pop()
+        turn = self.turn()
+        self.stones[turn] &= ~(1 << cell)
+        self.hash ^= self.zobrist[turn][cell]
+
+    def last_move_won(self):
+        """
+        Returns True if the last move completed k in a row.
+        """
+        if not self.history:
+            return False
+        cell = self.history[-1]
+        stones = self.stones[1 - self.turn()]
+        for w in self.windows_at[cell]:
+            if stones & w == w:
+                return True
+        return False
+
+    def winner(self):
+        for player, stones in zip([X, O], self.stones):
+            for w in self.windows:
+                if stones & w == w:
+                    return player
+        return None
+
+    def candidates(self):
+        """
+        Returns the bitboard of empty cells worth searching: those
+        near a stone, or the whole board before the first move.
+        """
+        if not self.history:
+            return self.full
+        return self.near[-1] & self.empty()
+
+    def evaluate(self):
+        """
+        Scores the position for the player to move by counting the
+        stones in each window that only one player has stones in.
+        """
+        mine = self.stones[self.turn()]
+        theirs = self.stones[1 - self.turn()]
+        score = 0
+        for w in self.windows:
+            a = (mine & w).bit_count()
+            b = (theirs & w).bit_count()
+            if a and not b:
+                score += 4 ** a
+            elif b and not a:
+                score -= 4 ** b
+        return score
+
+    def print(self):
+        for i in range(self.height):
+            print(" ".join(
+                "X" if self.stones[0] >> (i * self.width + j) & 1
+                else "O" if self.stones[1] >> (i * self.width + j) & 1
+                else "."
+                for j in range(self.width)
+            ))
+
+
+@functools.lru_cache(maxsize=16)
+def geometry(height, width, k, seed):
+    """
+    Returns the tables a Game of this shape needs, computed once per
+    shape: every window of k cells in a row, the windows through each
+    cell, the cells within RADIUS of each cell, and the Zobrist keys
+    of each player's stone on each cell. None of them are modified.
+    """
+    windows = []
+    for i in range(height):
+        for j in range(width):
+            for di, dj in [(0, 1), (1, 0), (1, 1), (1, -1)]:
+                end_i = i + di * (k - 1)
+                end_j = j + dj * (k - 1)
+                if 0 <= end_i < height and 0 <= end_j < width:
+                    windows.append(sum(
+                        1 << ((i + di * s) * width + j + dj * s)
+                        for s in range(k)
+                    ))
+    windows_at = [
+        [w for w in windows if w >> cell & 1]
+        for cell in range(height * width)
+    ]
+
+    nearby = []
+    for cell in range(height * width):
+        i, j = divmod(cell, width)
+        nearby.append(sum(
+            1 << (r * width + c)
+            for r in range(max(0, i - RADIUS), min(height, i + RADIUS + 1))
+            for c in range(max(0, j - RADIUS), min(width, j + RADIUS + 1))
+        ))
+
+    rng = random.Random(seed)
+    zobrist = [
+        [rng.getrandbits(64) for _ in range(height * width)] for _ in range(2)
+    ]
+    return windows, windows_at, nearby, zobrist
+
+
+class Engine():
+    """
+    Iterative deepening alpha-beta search over a Game. The
+    transposition table and history scores are kept between moves.
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.table = dict()
+        self.history = [0] * game.size
+        self.nodes = 0
+        self.deadline = None
+
+    def search(self, time_limit=1.0, max_depth=None):
+        """
+        Returns `(move, score, depth)` for the player to move: the best
+        cell found by the deepest search completed within `time_limit`
+        seconds, or to `max_depth` if `time_limit` is None, its score,
+        and that depth.
+        """
+        game = self.game
+        moves = len(game.history)
+        start = time.perf_counter()
+        self.deadline = deadline(start, time_limit)
+        remaining = game.empty().bit_count()
+        if max_depth is None or max_depth > remaining:
+            max_depth = remaining
+
+        # Fall back to the candidate nearest the centre if even depth 1
+        # times out
+        best = (central_candidate(game), 0, 0)
+        for depth in range(1, max_depth + 1):
+            try:
+                score = self.negamax(depth, -WIN - 1, WIN + 1, 0)
+            except Timeout:
+
+                # Take back the moves the interrupted search left made
+                while len(game.history) > moves:
+                    game.unmake()
+                break
+            best = (self.table[game.hash][3], score, depth)
+
+            # A forced result will not change at greater depths
+            if abs(score) > WIN_BOUND:
+                break
+            if time.perf_counter() - start > iteration_budget(time_limit):
+                break
+        return best
+
+    def negamax(self, depth, alpha, beta, ply):
+        # A leaf can cost thousands of window tests on large boards, so
+        # the clock is checked at every node rather than every few
+        self.nodes += 1
+        if time.perf_counter() > self.deadline:
+            raise Timeout
+        game = self.game
+        if game.last_move_won():
+            return -(WIN - ply)
+        if not game.empty():
+            return 0
+        if depth == 0:
+            return game.evaluate()
+
+        original_alpha = alpha
+        table_move = None
+        entry = self.table.get(game.hash)
+        if entry is not None:
+            entry_depth, score, flag, table_move = entry
+            if entry_depth >= depth:
+                score = from_table(score, ply)
+                if flag == EXACT:
+                    return score
+                if flag == LOWER:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        best_score = -WIN - 1
+        best_move = None
+        for move in self.ordered_moves(table_move):
+            game.make(move)
+            score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            game.unmake()
+            if score > best_score:
+                best_score, best_move = score, move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                self.history[move] += depth * depth
+                break
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table[game.hash] = (
+            depth, to_table(best_score, ply), flag, best_move
+        )
+        return best_score
+
+    def ordered_moves(self, table_move):
+        """
+        Returns the candidate moves, the table's best move first and
+        the rest by history score.
+        """
+        moves = []
+        free = self.game.candidates()
+        while free:
+            bit = free & -free
+            moves.append(bit.bit_length() - 1)
+            free ^= bit
+        moves.sort(key=self.history.__getitem__, reverse=True)
+        if table_move is not None and table_move in moves:
+            moves.remove(table_move)
+            moves.insert(0, table_move)
+        return moves
+
+
+def to_table(score, ply):
+    """
+    Converts a win score from distance to the root into distance
+    to the current node, so it is valid wherever it is looked up.
+    """
+    if score > WIN_BOUND:
+        return score + ply
+    if score < -WIN_BOUND:
+        return score - ply
+    return score
+
+
+def from_table(score, ply):
+    if score > WIN_BOUND:
+        return score - ply
+    if score < -WIN_BOUND:
+        return score + ply
+    return score
+
+
+def deadline(start, time_limit):
+    """
+    Returns the time at which a search started at `start` must stop,
+    leaving SAFETY_MARGIN of `time_limit` to spare.
+    """
+    if time_limit is None:
+        return math.inf
+    return start + time_limit * (1 - SAFETY_MARGIN)
+
+
+def central_candidate(game):
+    """
+    Returns the candidate cell nearest the centre of the board.
+    """
+    centre_i = (game.height - 1) / 2
+    centre_j = (game.width - 1) / 2
+    cells = []
+    free = game.candidates()
+    while free:
+        bit = free & -free
+        cells.append(bit.bit_length() - 1)
+        free ^= bit
+    return min(cells, key=lambda cell: (
+        (cell // game.width - centre_i) ** 2
+        + (cell % game.width - centre_j) ** 2
+    ))
+
+
+def iteration_budget(time_limit):
+    """
+    Returns the seconds after which no new iteration is started, since
+    it would be unlikely to finish in the time left.
+    """
+    return math.inf if time_limit is None else time_limit / 2
+
+
+def search_root_moves(height, width, k, history, moves, time_limit,
+                      max_depth):
+    """
+    Searches the root moves `moves` of the position reached by playing
+    `history` on an empty board, deepening one ply at a time.
+
+    Returns a list with one `(score, move)` per completed depth, the
+    best of `moves` at that depth.
+    """
+    game = Game(height, width, k)
+    for cell in history:
+        game.make(cell)
+    engine = Engine(game)
+    start = time.perf_counter()
+    engine.deadline = deadline(start, time_limit)
+
+    results = []
+    for depth in range(1, max_depth + 1):
+        best = (-WIN - 1, None)
+        try:
+            for move in moves:
+                game.make(move)
+                score = -engine.negamax(depth - 1, -WIN - 1, -best[0], 1)
+                game.unmake()
+                if score > best[0]:
+                    best = (score, move)
+        except Timeout:
+            break
+        results.append(best)
+        if best[0] > WIN_BOUND:
+            break
+        if time.perf_counter() - start > iteration_budget(time_limit):
+            break
+    return results
+
+
+def parallel_search(game, time_limit=1.0, max_depth=None, workers=None,
+                    executor=None):
+    """
+    Returns `(move, score, depth)` like Engine.search, splitting the
+    root moves round-robin across `workers` processes. Uses `executor`
+    if given instead of starting a new process pool.
+    """
+    engine = Engine(game)
+    moves = engine.ordered_moves(None)
+    remaining = game.empty().bit_count()
+    if max_depth is None or max_depth > remaining:
+        max_depth = remaining
+    workers = min(workers or os.cpu_count() or 1, len(moves))
+    shares = [moves[i::workers] for i in range(workers)]
+
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return parallel_search(game, time_limit, max_depth, workers, pool)
+    futures = [
+        executor.submit(search_root_moves, game.height, game.width, game.k,
+                        list(game.history), share, time_limit, max_depth)
+        for share in shares
+    ]
+    results = [future.result() for future in futures]
+
+    # A forced win needs no deeper search by the other workers
+    wins = [(*r[-1], len(r)) for r in results if r and r[-1][0] > WIN_BOUND]
+    if wins:
+        score, move, depth = max(wins)
+        return move, score, depth
+
+    depth = min(len(r) for r in results)
+    if depth == 0:
+        return moves[0], 0, 0
+    score, move = max(r[depth - 1] for r in results)
+    return move, score, depth
+
+
+def best_move(board, k=3, time_limit=1.0):
+    """
+    Returns the action (i, j) for the player to move on a list board
+    of any size within `time_limit` seconds, including the time taken
+    to set up the position.
+    """
+    start = time.perf_counter()
+    game = Game.from_board(board, k)
+    if game.winner() or not game.empty():
+        return None
+    remaining = time_limit - (time.perf_counter() - start)
+    move, _, _ = Engine(game).search(max(remaining, 0.0))
+    return divmod(move, game.width)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--height", type=int, default=3)
+    parser.add_argument("--width", type=int, default=3)
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--time", type=float, default=1.0,
+                        help="seconds per move")
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    # Play the engine against itself
+    game = Game(args.height, args.width, args.k)
+    engine = Engine(game)
+    pool = ProcessPoolExecutor(args.workers) if args.workers > 1 else None
+    slowest = 0.0
+    while not game.last_move_won() and game.empty():
+        start = time.perf_counter()
+        nodes = engine.nodes
+        if pool:
+            move, score, depth = parallel_search(
+                game, args.time, workers=args.workers, executor=pool
+            )
+            searched = f"{args.workers} workers"
+        else:
+            move, score, depth = engine.search(args.time)
+            searched = f"{engine.nodes - nodes} nodes"
+        elapsed = time.perf_counter() - start
+        slowest = max(slowest, elapsed)
+        print(f"{'XO'[game.turn()]} plays {divmod(move, game.width)}: "
+              f"depth {depth}, score {score}, "
+              f"{searched} in {elapsed:.3f} s")
+        game.make(move)
+    if pool:
+        pool.shutdown()
+    game.print()
+    print(f"Winner: {game.winner() or 'none'}")
+    print(f"Slowest move: {slowest:.3f} s (budget {args.time} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,11 @@ import time
 
 import tictactoe as ttt
 
+# Play from the opening book built by `python tictactoe.py`, if it has
+# been run, instead of searching
+if not ttt.load_book():
+    ttt.load_table()
+
 pygame.init()
 size = width, height = 600, 400
 
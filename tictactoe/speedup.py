@@ -0,0 +1,84 @@
+"""
+Speedup of parallel root-split search over serial search on m,n,k
+boards.
+
+Searches a few opening positions to a fixed depth, first with a single
+Engine and then with parallel_search on pools of increasing size, and
+reports the time and speedup for each number of workers. Every pool is
+started before timing, so process startup is not counted.
+
+Usage: python speedup.py [--height M] [--width N] [-k K] [--depth D]
+                         [--workers W ...]
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from mnk import Engine, Game, parallel_search
+
+# Moves played before each searched position, as (row, column)
+OPENINGS = [
+    [],
+    [(0, 0)],
+    [(1, 1), (1, 2)],
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--height", type=int, default=5)
+    parser.add_argument("--width", type=int, default=5)
+    parser.add_argument("-k", type=int, default=4)
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--workers", type=int, nargs="+", default=None)
+    args = parser.parse_args()
+    counts = args.workers or worker_counts(os.cpu_count() or 1)
+
+    games = [opening(args.height, args.width, args.k, moves)
+             for moves in OPENINGS]
+
+    start = time.perf_counter()
+    for game in games:
+        Engine(game).search(None, args.depth)
+    serial = time.perf_counter() - start
+    print(f"{'workers':>8}{'seconds':>10}{'speedup':>10}")
+    print(f"{'serial':>8}{serial:>10.3f}{1:>10.2f}")
+
+    for workers in counts:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+
+            # Start every worker process before timing
+            list(pool.map(abs, range(workers)))
+            start = time.perf_counter()
+            for game in games:
+                parallel_search(game, None, args.depth, workers, pool)
+            elapsed = time.perf_counter() - start
+        print(f"{workers:>8}{elapsed:>10.3f}{serial / elapsed:>10.2f}")
+
+
+def opening(height, width, k, moves):
+    """
+    Returns the Game after playing `moves` from an empty board.
+    """
+    game = Game(height, width, k)
+    for i, j in moves:
+        game.make(i * width + j)
+    return game
+
+
+def worker_counts(cpus):
+    """
+    Returns 1, 2, 4, ... up to and including `cpus`.
+    """
+    counts = []
+    n = 1
+    while n < cpus:
+        counts.append(n)
+        n *= 2
+    return counts + [cpus]
+
+
+if __name__ == "__main__":
+    main()
@@ -2,14 +2,32 @@
 Tic Tac Toe Player
 """
 
-import math
-from copy import deepcopy
+import json
+import os
 
 X = "X"
 O = "O"
 EMPTY = None
 
-infinity = float('inf')
+# Cell indices 0-8 of each row, column and diagonal
+LINES = [(0, 1, 2), (3, 4, 5), (6, 7, 8),
+         (0, 3, 6), (1, 4, 7), (2, 5, 8),
+         (0, 4, 8), (2, 4, 6)]
+
+# Cell codes used in encoded boards
+CODES = {EMPTY: 0, X: 1, O: 2}
+
+# File the transposition table is saved to and loaded from
+TABLE_FILE = os.path.join(os.path.dirname(__file__), "table.json")
+
+# File the opening book is saved to and loaded from
+BOOK_FILE = os.path.join(os.path.dirname(__file__), "book.bin")
+
+# Opening book entries: the low 4 bits hold the best move, or NO_MOVE
+# if the game is over, and the high bits hold the value plus one.
+# Positions that cannot be reached in a game are UNREACHABLE.
+NO_MOVE = 15
+UNREACHABLE = 0xFF
 
 def initial_state():
     """
@@ -42,7 +60,7 @@ def result(board, action):
     """
     if action[0] < 0 or action[0] > 2 or action[1] < 0 or action[1] > 2 or board[action[0]][action[1]]:
         raise Exception(str(action) + ' is not a valid move')
-    result = deepcopy(board)
+    result = [row[:] for row in board]
     result[action[0]][action[1]] = player(board)
     return result
 
@@ -90,53 +108,198 @@ def utility(board):
     return 1 if victor == X else (-1 if victor == O else 0)
 
 
-# alpha is the minimum score a maximizing player is assured of
-# beta is the maximum score a minimizing player is assured of
+def symmetries():
+    """
+    Returns the 8 rotations and reflections of the board. Each is a
+    tuple `p` of cell indices such that the transformed board has
+    cell `p[k]` of the original board at position `k`.
+    """
+    rotate = [3 * (2 - k % 3) + k // 3 for k in range(9)]
+    mirror = [3 * (k // 3) + 2 - k % 3 for k in range(9)]
+    result = []
+    p = tuple(range(9))
+    for _ in range(4):
+        result.append(p)
+        result.append(tuple(p[m] for m in mirror))
+        p = tuple(p[r] for r in rotate)
+    return result
 
-def min_ply(board, alpha, beta):
-    if terminal(board):
-        return (utility(board), None)
-    
-    moves = actions(board)
-    best_score = infinity
-    best_move = None
-    for m in moves:
-        b = result(board, m)
-        score, _ = max_ply(b, alpha, beta)
-        if best_score <= alpha:
-            break
-        beta = min(beta, score)
-        if score < best_score:
-            best_score = score
-            best_move = m
 
-    return (best_score, best_move)
+SYMMETRIES = symmetries()
 
+# Solved positions: canonical code -> (value, best move in that frame)
+table = dict()
 
-def max_ply(board, alpha, beta):
-    if terminal(board):
-        return (utility(board), None)
-    
-    moves = actions(board)
-    best_score = -infinity
+
+def canonical(cells):
+    """
+    Returns `(code, p)` where `code` is the smallest base-3 encoding
+    of any rotation or reflection of `cells`, a tuple of 9 cell codes,
+    and `p` is the symmetry that produces it.
+    """
+    best = None
+    for p in SYMMETRIES:
+        code = 0
+        for k in reversed(p):
+            code = code * 3 + cells[k]
+        if best is None or code < best[0]:
+            best = (code, p)
+    return best
+
+
+def cell_winner(cells):
+    """
+    Returns the cell code of the player with three in a row, or 0.
+    """
+    for a, b, c in LINES:
+        if cells[a] and cells[a] == cells[b] == cells[c]:
+            return cells[a]
+    return 0
+
+
+def solve(cells):
+    """
+    Returns `(value, move)` for the position `cells`, where `value` is
+    the utility of the game under perfect play and `move` is the index
+    of an optimal cell for the player to move, or None if the game
+    is over. Each position is searched once, together with its
+    rotations and reflections, and looked up in `table` afterwards.
+    """
+    code, p = canonical(cells)
+    if code not in table:
+        table[code] = search(tuple(cells[k] for k in p))
+    value, move = table[code]
+    return value, (None if move is None else p[move])
+
+
+def search(cells):
+    """
+    Returns `(value, move)` for `cells` by solving every child position.
+    """
+    victor = cell_winner(cells)
+    if victor:
+        return (1 if victor == CODES[X] else -1), None
+    if 0 not in cells:
+        return 0, None
+
+    # X moves first, so X is to move whenever the counts are equal
+    turn = CODES[X] if cells.count(1) == cells.count(2) else CODES[O]
+    best_value = None
     best_move = None
-    for m in moves:
-        b = result(board, m)
-        score, _ = min_ply(b, alpha, beta)
-        if best_score >= beta:
-            break
-        alpha = max(alpha, score)
-        if score > best_score:
-            best_score = score
-            best_move = m
-
-    return (best_score, best_move)
-    
+    for k in range(9):
+        if cells[k]:
+            continue
+        child = cells[:k] + (turn,) + cells[k + 1:]
+        value, _ = solve(child)
+        if (best_value is None
+                or (turn == CODES[X] and value > best_value)
+                or (turn == CODES[O] and value < best_value)):
+            best_value, best_move = value, k
+    return best_value, best_move
+
+
+def save_table(path=TABLE_FILE):
+    """
+    Writes every solved position to `path` as JSON.
+    """
+    with open(path, "w") as f:
+        json.dump({code: list(entry) for code, entry in table.items()}, f)
+
+
+def load_table(path=TABLE_FILE):
+    """
+    Adds the positions solved in a previous run, saved by save_table,
+    to the transposition table. Returns False if there is no such file.
+    """
+    if not os.path.exists(path):
+        return False
+    with open(path) as f:
+        for code, (value, move) in json.load(f).items():
+            table[int(code)] = (value, move)
+    return True
+
+
+def encode(cells):
+    """
+    Returns the base-3 encoding of `cells`, with cell 0 as the
+    lowest digit.
+    """
+    code = 0
+    for k in range(8, -1, -1):
+        code = code * 3 + cells[k]
+    return code
+
+
+def build_book():
+    """
+    Solves every position reachable from the initial state and returns
+    the opening book: one byte per base-3 board encoding, holding the
+    position's value and best move as described at NO_MOVE.
+    """
+    result = bytearray([UNREACHABLE]) * 3 ** 9
+    frontier = [(0,) * 9]
+    while frontier:
+        cells = frontier.pop()
+        code = encode(cells)
+        if result[code] != UNREACHABLE:
+            continue
+        value, move = solve(cells)
+        result[code] = (value + 1) << 4 | (NO_MOVE if move is None else move)
+        if move is None:
+            continue
+        turn = CODES[X] if cells.count(1) == cells.count(2) else CODES[O]
+        for k in range(9):
+            if not cells[k]:
+                frontier.append(cells[:k] + (turn,) + cells[k + 1:])
+    return result
+
+
+# Opening book used by minimax once loaded, or None
+book = None
+
+
+def save_book(data, path=BOOK_FILE):
+    """
+    Writes an opening book made by build_book to `path`.
+    """
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def load_book(path=BOOK_FILE):
+    """
+    Loads the opening book saved at `path` for minimax to use.
+    Returns False if there is no such file.
+    """
+    global book
+    if not os.path.exists(path):
+        return False
+    with open(path, "rb") as f:
+        data = bytearray(f.read())
+    if len(data) != 3 ** 9:
+        raise Exception(f"{path} is not an opening book")
+    book = data
+    return True
+
+
 def minimax(board):
     """
     Returns the optimal action for the current player on the board.
     """
+    cells = tuple(CODES[cell] for row in board for cell in row)
+    if book is not None and book[encode(cells)] != UNREACHABLE:
+        move = book[encode(cells)] & 15
+        return None if move == NO_MOVE else divmod(move, 3)
     if terminal(board):
         return None
-    score, move = max_ply(board, -infinity, infinity) if player(board) == X else min_ply(board, -infinity, infinity)
-    return move
+    _, move = solve(cells)
+    return divmod(move, 3)
+
+
+if __name__ == "__main__":
+    data = build_book()
+    save_book(data)
+    save_table()
+    positions = len(data) - data.count(UNREACHABLE)
+    print(f"Solved {positions} positions ({len(table)} up to symmetry), "
+          f"saved to {BOOK_FILE}")